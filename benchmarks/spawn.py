@@ -0,0 +1,64 @@
+"""
+Compare the latency of launching a subprocess with `fork`, with `subprocess` and
+with the plugin's `posix_spawn` backend, as the memory of the parent process
+grows. Note that `subprocess` uses `vfork` on Linux with Python 3.10 and later,
+and `fork` on older versions.
+
+    python benchmarks/spawn.py [--runs 50] [--rss 0 256 1024]
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from tox_venv import spawn
+
+ARGS = ['true']
+
+
+def fork_exec(args):
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover
+        try:
+            os.execvp(args[0], args)
+        finally:
+            os._exit(127)
+    os.waitpid(pid, 0)
+
+
+def measure(launch, runs):
+    started = time.time()
+    for _ in range(runs):
+        launch(ARGS)
+    return (time.time() - started) / runs
+
+
+def max_rss():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # the maximum RSS is reported in bytes on macOS, and in kilobytes elsewhere
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=50, help='The number of launches per measurement.')
+    parser.add_argument('--rss', type=int, nargs='+', default=[0, 256, 1024], help='The parent memory sizes, in MB.')
+    args = parser.parse_args(argv)
+
+    if not spawn.use_posix_spawn():
+        sys.exit('posix_spawn is not available')
+
+    ballast = []
+    sys.stdout.write('%10s %14s %14s %14s\n' % ('rss (MB)', 'fork', 'subprocess', 'posix_spawn'))
+    for size in sorted(args.rss):
+        # touch the pages, so that they are mapped into the parent
+        ballast.append(b'x' * (size * 1024 ** 2 - sum(map(len, ballast))))
+        launchers = [fork_exec, subprocess.check_output, spawn.check_output]
+        timings = [measure(launch, args.runs) * 1000 for launch in launchers]
+        sys.stdout.write('%10d %12.2fms %12.2fms %12.2fms\n' % tuple([max_rss() // 1024] + timings))
+
+
+if __name__ == '__main__':
+    main()
@@ -19,7 +19,14 @@ setup(
     version='0.4.0',
     package_dir={'': 'src'},
     packages=find_packages('src'),
-    entry_points={'tox': ['venv = tox_venv.hooks']},
+    entry_points={
+        'tox': ['venv = tox_venv.hooks'],
+        'console_scripts': [
+            'tox-venv-archive = tox_venv.archive:main',
+            'tox-venv-stats = tox_venv.stats:main',
+            'tox-venv-warm = tox_venv.warm:main',
+        ],
+    },
     install_requires=['tox>=3.8.1'],
     classifiers=[
         'Development Status :: 3 - Alpha',
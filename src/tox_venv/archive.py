@@ -0,0 +1,273 @@
+"""
+Export the testenvs of a tox work dir as a relocatable archive, and import them
+into another work dir, e.g. to restore them from a CI cache.
+
+    tox-venv-archive export [--workdir .tox] [-e ENV ...] ARCHIVE
+    tox-venv-archive import [--workdir .tox] [--rootdir DIR] ARCHIVE
+
+The archive contains the testenvs (and the shared environments they link to)
+relative to the work dir, and a manifest listing the files that embed absolute
+paths. Importing the archive is a tar extract, followed by rewriting the old
+paths in the listed files.
+"""
+import argparse
+import fnmatch
+import io
+import json
+import os
+import posixpath
+import re
+import sys
+import tarfile
+
+import py
+
+from .cache import temp_path
+from .collect import USED, linked_entries
+from .pycache import COMPILE_LIST
+
+MANIFEST = 'tox-venv-manifest.json'
+
+FORMAT = 1
+
+# Entries of a testenv's directory that are not exported.
+EXCLUDE = ('log', 'tmp', USED, COMPILE_LIST)
+
+# The files that may embed the absolute path of the testenv or the project (patterns, e.g. for the finders and path
+# files of PEP 660 editable installs).
+REWRITE_NAMES = (
+    'pyvenv.cfg', 'RECORD', 'direct_url.json', 'installed-files.txt', '__editable___*_finder.py', '__editable__.*.pth',
+)
+REWRITE_EXTENSIONS = ('.pth', '.egg-link')
+SCRIPT_DIRS = ('bin', 'Scripts')
+
+
+def find_envs(toxworkdir):
+    """
+    Return the names of the testenvs of the work dir.
+    """
+    return sorted(
+        path.basename for path in toxworkdir.listdir(lambda p: p.check(dir=1, link=0))
+        if path.join('.tox-config1').check()
+    )
+
+
+def is_rewrite_candidate(parts):
+    """
+    Determine if a file may embed absolute paths, from its path parts relative
+    to the environment.
+    """
+    name = parts[-1]
+    return (
+        any(fnmatch.fnmatchcase(name, pattern) for pattern in REWRITE_NAMES)
+        or name.endswith(REWRITE_EXTENSIONS)
+        or name.startswith('activate')
+        or (len(parts) == 2 and parts[0] in SCRIPT_DIRS)
+    )
+
+
+def embeds(path, prefixes):
+    with io.open(path, 'rb') as f:
+        content = f.read()
+    return any(prefix.encode('utf-8') in content for prefix in prefixes)
+
+
+def find_rewrites(root, prefixes):
+    """
+    Return the paths of the files of the environment at `root` that embed one of
+    the `prefixes`, relative to `root`.
+    """
+    rewrites = []
+    for dirpath, dirs, files in os.walk(str(root)):
+        relative = os.path.relpath(dirpath, str(root))
+        parts = [] if relative == os.curdir else relative.split(os.sep)
+        for name in files:
+            path = os.path.join(dirpath, name)
+            if not os.path.islink(path) and is_rewrite_candidate(parts + [name]) and embeds(path, prefixes):
+                rewrites.append('/'.join(parts + [name]))
+    return sorted(rewrites)
+
+
+def relative_link(link, target, toxworkdir):
+    """
+    Make a link into the work dir relative, so that it survives the relocation.
+    """
+    if not os.path.isabs(target) or not is_within(target, toxworkdir):
+        return target
+    return os.path.relpath(target, os.path.dirname(link))
+
+
+def is_within(path, toxworkdir):
+    return path.startswith(str(toxworkdir) + os.sep)
+
+
+def export_envs(toxworkdir, names, archive, rootdir=None):
+    """
+    Write the testenvs to the archive, and return the manifest.
+    """
+    rootdir = rootdir or toxworkdir.dirpath()
+    prefixes = [str(toxworkdir), str(rootdir)]
+    manifest = {
+        'format': FORMAT,
+        'toxworkdir': str(toxworkdir),
+        'rootdir': str(rootdir),
+        'envs': {},
+        'rewrite': [],
+    }
+
+    real = py.path.local(os.path.realpath(str(toxworkdir)))
+    paths = []
+    for name in names:
+        path = toxworkdir.join(name)
+        if not path.join('.tox-config1').check():
+            raise ValueError('%s is not a testenv' % path)
+        shared = sorted(
+            real.bestrelpath(py.path.local(linked)) for linked in linked_entries(path) if is_within(linked, real)
+        )
+        manifest['envs'][name] = {'shared': shared}
+        paths.append(name)
+        paths.extend(relpath for relpath in shared if relpath not in paths)
+
+    def include(root):
+        def select(info):
+            parts = posixpath.relpath(info.name, root).split('/')
+            if parts[0] in EXCLUDE or parts[-1].endswith('.lock'):
+                return None
+            if info.issym():
+                info.linkname = relative_link(str(toxworkdir.join(info.name)), info.linkname, toxworkdir)
+            elif info.isfile() and is_rewrite_candidate(parts):
+                if embeds(str(toxworkdir.join(info.name)), prefixes):
+                    manifest['rewrite'].append(info.name)
+            return info
+        return select
+
+    mode = 'w:gz' if str(archive).endswith(('.gz', '.tgz')) else 'w'
+    with tarfile.open(str(archive), mode) as tar:
+        # the manifest is written last, as it is only complete after the envs
+        for relpath in paths:
+            tar.add(str(toxworkdir.join(relpath)), arcname=relpath, filter=include(relpath))
+
+        data = json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8')
+        info = tarfile.TarInfo(MANIFEST)
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+    return manifest
+
+
+def rewrite(path, replacements):
+    """
+    Replace the old paths in the file, longest first.
+    """
+    pattern = re.compile(b'|'.join(
+        re.escape(old) for old in sorted(replacements, key=len, reverse=True)
+    ))
+    with io.open(str(path), 'rb') as f:
+        content = f.read()
+    replaced = pattern.sub(lambda match: replacements[match.group(0)], content)
+    if replaced != content:
+        mode = path.stat().mode
+        with io.open(str(path), 'wb') as f:
+            f.write(replaced)
+        path.chmod(mode)
+
+
+def safe_members(tar):
+    for info in tar:
+        if posixpath.isabs(info.name) or '..' in info.name.split('/'):
+            raise ValueError('unsafe archive member %s' % info.name)
+        yield info
+
+
+def import_envs(toxworkdir, archive, rootdir=None):
+    """
+    Extract the testenvs of the archive into the work dir, replacing existing
+    testenvs of the same name, and return the manifest.
+    """
+    rootdir = rootdir or toxworkdir.dirpath()
+    staging = temp_path(toxworkdir.join('.tox-venv'), 'import')
+    staging.ensure(dir=1)
+    try:
+        with tarfile.open(str(archive), 'r:*') as tar:
+            kwargs = {'filter': 'tar'} if hasattr(tarfile, 'tar_filter') else {}
+            tar.extractall(str(staging), members=safe_members(tar), **kwargs)
+
+        with io.open(str(staging.join(MANIFEST)), encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('format') != FORMAT:
+            raise ValueError('unsupported archive format %r' % manifest.get('format'))
+
+        replacements = {
+            manifest['toxworkdir'].encode('utf-8'): str(toxworkdir).encode('utf-8'),
+            manifest['rootdir'].encode('utf-8'): str(rootdir).encode('utf-8'),
+        }
+        for relpath in manifest['rewrite']:
+            rewrite(staging.join(relpath), replacements)
+
+        for name, env in sorted(manifest['envs'].items()):
+            for relpath in env['shared']:
+                # shared environments are keyed by their fingerprint
+                if not toxworkdir.join(relpath).check() and staging.join(relpath).check():
+                    toxworkdir.join(relpath).dirpath().ensure(dir=1)
+                    staging.join(relpath).rename(toxworkdir.join(relpath))
+            target = toxworkdir.join(name)
+            if target.check():
+                target.remove(rec=1)
+            staging.join(name).rename(target)
+    finally:
+        staging.remove(rec=1, ignore_errors=True)
+    return manifest
+
+
+def missing_interpreters(toxworkdir, manifest):
+    """
+    Return the names of the imported testenvs whose base interpreter does not
+    exist on this machine. tox recreates these testenvs.
+    """
+    missing = []
+    for name in sorted(manifest['envs']):
+        cfg = toxworkdir.join(name, 'pyvenv.cfg')
+        if not cfg.check():
+            continue
+        for line in cfg.readlines(cr=0):
+            key, _, value = line.partition('=')
+            if key.strip() == 'home' and not os.path.isdir(value.strip()):
+                missing.append(name)
+    return missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='tox-venv-archive', description='Export and import relocatable testenvs.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    export = commands.add_parser('export', help='Export the testenvs of a tox work dir.')
+    export.add_argument('archive', help='The archive to write (compressed if it ends with .gz or .tgz).')
+    export.add_argument('-e', dest='envs', action='append', help='Export this testenv (default: all testenvs).')
+
+    restore = commands.add_parser('import', help='Import the testenvs of an archive into a tox work dir.')
+    restore.add_argument('archive', help='The archive to read.')
+
+    for command in [export, restore]:
+        command.add_argument('--workdir', default='.tox', help='The tox work dir (default: .tox).')
+        command.add_argument(
+            '--rootdir', help='The project dir, for paths of develop installs (default: the parent of the work dir).',
+        )
+    args = parser.parse_args(argv)
+
+    toxworkdir = py.path.local(args.workdir)
+    rootdir = py.path.local(args.rootdir) if args.rootdir else None
+    if args.command == 'export':
+        manifest = export_envs(toxworkdir, args.envs or find_envs(toxworkdir), args.archive, rootdir)
+        sys.stdout.write('exported %s to %s\n' % (', '.join(sorted(manifest['envs'])), args.archive))
+        return 0
+
+    toxworkdir.ensure(dir=1)
+    manifest = import_envs(toxworkdir, args.archive, rootdir)
+    sys.stdout.write('imported %s into %s\n' % (', '.join(sorted(manifest['envs'])), toxworkdir))
+    for name in missing_interpreters(toxworkdir, manifest):
+        sys.stdout.write('%s: the base interpreter is missing, tox will recreate the testenv\n' % name)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
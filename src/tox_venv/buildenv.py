@@ -0,0 +1,123 @@
+import hashlib
+import os
+
+import py
+import tox
+from tox import reporter
+from tox.package.view import create_session_view
+
+from .cache import cache_dir, cached, temp_path
+from .collect import mark_used
+from .events import emit
+from .runner import streamed
+
+# Build requirements assumed by pip for projects without a `[build-system]`.
+DEFAULT_REQUIRES = ['setuptools>=40.8.0', 'wheel']
+
+
+def get_build_requires(setupdir):
+    """
+    Return the build-system requirements of the project, as per PEP 518.
+    """
+    toml_file = setupdir.join('pyproject.toml')
+    if not toml_file.check(file=1):
+        return list(DEFAULT_REQUIRES)
+
+    from tox.config import get_py_project_toml
+    build_system = get_py_project_toml(toml_file).get('build-system', {})
+    return list(build_system.get('requires', DEFAULT_REQUIRES))
+
+
+def build_env_key(requires, executable, version_info):
+    """
+    Compute the cache key of a build environment, from its build requirements
+    and its interpreter.
+    """
+    digest = hashlib.sha256()
+    for part in [executable, '.'.join(map(str, version_info))] + sorted(requires):
+        digest.update(part.encode('utf-8') + b'\n')
+    return digest.hexdigest()[:16]
+
+
+def envpython(path):
+    if os.name == 'nt':  # pragma: no cover
+        return str(path.join('Scripts', 'python.exe'))
+    return str(path.join('bin', 'python'))
+
+
+def ensure_build_env(venv, action, key, executable, requires):
+    """
+    Return the build environment for `key`, creating it unless it already exists.
+    The environment is only used through `python -m`, so it remains valid after
+    being published to the cache.
+    """
+    from .hooks import venv_args
+
+    def create(path):
+        action.setactivity('buildenv-create', path)
+        path.ensure(dir=1)
+        with streamed(action):
+            venv._pcall(venv_args(executable) + [str(path)], venv=False, action=action, cwd=path.dirpath())
+
+            args = [envpython(path), '-m', 'pip', 'install'] + requires
+            venv._pcall(args, venv=False, action=action, cwd=path)
+
+    root = cache_dir(venv.envconfig.config, 'build')
+    hit = root.join(key).check()
+    if hit:
+        action.setactivity('buildenv-reuse', root.join(key))
+    emit(venv.envconfig.config, 'cache', env=venv.name, cache='build', key=key, hit=hit)
+    path = cached(root, key, create)
+    mark_used(path)
+    return path
+
+
+def build_package(session, venv):
+    """
+    Build the package as a wheel, using a build environment that is cached by
+    build requirements and interpreter. Build environments are shared across
+    testenvs and tox runs, and the built wheel is shared by the testenvs of a
+    session that use the same build environment.
+    """
+    config = session.config
+    if config.sdistsrc or config.option.installpkg:
+        return None
+
+    from .hooks import get_real_executable
+
+    executable = get_real_executable(venv)
+    requires = get_build_requires(config.setupdir)
+    key = build_env_key(requires, executable, venv.envconfig.python_info.version_info)
+
+    built = getattr(session, 'venv_build_cache', None)
+    if built is None:
+        built = session.venv_build_cache = {}
+    if key in built:
+        return built[key]
+
+    # Each build has its own output dir, so concurrent builds don't wait on each other
+    distdir = temp_path(cache_dir(config, 'dist'), key)
+    try:
+        with venv.new_action('buildpkg', config.setupdir) as action:
+            path = ensure_build_env(venv, action, key, executable, requires)
+
+            distdir.ensure(dir=1)
+            args = [
+                envpython(path), '-m', 'pip', 'wheel', '--no-deps', '--no-build-isolation',
+                '--wheel-dir', str(distdir), str(config.setupdir),
+            ]
+            venv._pcall(args, venv=False, action=action, cwd=config.setupdir)
+
+        wheels = distdir.listdir('*.whl')
+        if len(wheels) != 1:
+            reporter.warning('expected a single wheel in %s' % distdir)
+            return None
+
+        built[key] = create_session_view(py.path.local(wheels[0]), config.temp_dir)
+    except tox.exception.InvocationError as exception:
+        # Fall back to tox's own packaging
+        reporter.warning('could not build package with cached build env - v = %r' % (exception, ))
+        return None
+    finally:
+        distdir.remove(rec=1, ignore_errors=True)
+    return built[key]
@@ -0,0 +1,86 @@
+"""
+Byte-compile a list of sources with a pool of worker processes.
+
+This script is run by the testenv's interpreter, and must not import anything
+beyond the standard library:
+
+    python bytecompile.py <list file> <workers> [<invalidation mode> [<pyc store>]]
+
+A worker count of 0 uses one worker per CPU. With a pyc store, the pycs are
+shared: each pyc is compiled once into the store, keyed by the magic number and
+the hash of its source, and is hardlinked into the `__pycache__` of every
+source with the same contents. This requires hash-checked pycs, as the mtime of
+the sources differs. The `co_filename` of the shared pycs is that of the first
+compiled source, which the import system replaces when loading them.
+"""
+import compileall
+import functools
+import io
+import os
+import sys
+
+
+def link(entry, path):
+    """
+    Atomically replace `path` with a hardlink to `entry`, or a copy of it.
+    """
+    temp = '%s.tmp-%d' % (path, os.getpid())
+    try:
+        os.link(entry, temp)
+    except OSError:
+        import shutil
+        shutil.copyfile(entry, temp)
+    os.replace(temp, path)
+
+
+def compile_shared(source, store, invalidation_mode):
+    import hashlib
+    import importlib.util
+    import py_compile
+
+    with io.open(source, 'rb') as f:
+        key = hashlib.sha256(f.read()).hexdigest()
+    entry = os.path.join(store, importlib.util.MAGIC_NUMBER.hex(), key[:2], '%s.pyc' % key)
+
+    if not os.path.exists(entry):
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        temp = '%s.tmp-%d' % (entry, os.getpid())
+        try:
+            py_compile.compile(source, cfile=temp, doraise=True, invalidation_mode=invalidation_mode)
+        except py_compile.PyCompileError as exception:
+            sys.stdout.write('%s\n' % exception.msg)
+            return False
+        os.replace(temp, entry)
+
+    path = importlib.util.cache_from_source(source)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    link(entry, path)
+    return True
+
+
+def main(argv):
+    list_file, workers = argv[0], int(argv[1])
+    kwargs = {'quiet': 1}
+    if len(argv) > 2:
+        import py_compile
+        kwargs['invalidation_mode'] = py_compile.PycInvalidationMode[argv[2].upper().replace('-', '_')]
+
+    with io.open(list_file, encoding='utf-8') as f:
+        sources = f.read().splitlines()
+
+    if len(argv) > 3:
+        compile_file = functools.partial(compile_shared, store=argv[3], invalidation_mode=kwargs['invalidation_mode'])
+    else:
+        compile_file = functools.partial(compileall.compile_file, **kwargs)
+    if workers == 1:
+        results = list(map(compile_file, sources))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers or None) as executor:
+            results = list(executor.map(compile_file, sources, chunksize=64))
+
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,76 @@
+import os
+import uuid
+
+from filelock import FileLock, Timeout
+from tox import reporter
+
+
+def cache_dir(config, *parts):
+    """
+    Return a directory of the plugin's cache within the tox working directory.
+    """
+    return config.toxworkdir.join('.tox-venv', *parts)
+
+
+def temp_path(root, key):
+    """
+    Return a unique path next to the cache entry `key`, for populating it
+    before it is published.
+    """
+    return root.join('%s.tmp-%d-%s' % (key, os.getpid(), uuid.uuid4().hex[:8]))
+
+
+def remove_stale(root, key):
+    """
+    Remove the leftovers of builds of the entry `key` that did not complete.
+    This must only be called while holding the entry's lock, as the builds
+    hold it until they are published.
+    """
+    for path in root.listdir('%s.tmp-*' % key):
+        reporter.verbosity1('removing stale cache entry %s' % path)
+        path.remove(rec=1, ignore_errors=True)
+
+
+def lock_entry(root, key):
+    lock = FileLock(str(root.join('%s.lock' % key)))
+    try:
+        lock.acquire(0.0001)
+    except Timeout:
+        reporter.verbosity0('lock file %s present, will block until released' % lock.lock_file)
+        lock.acquire()
+    return lock
+
+
+def cached(root, key, build):
+    """
+    Return the path of the cache entry `key` under `root`, calling `build(path)`
+    to populate it if it does not exist yet.
+
+    The entries are published by renaming a fully populated temporary path, so
+    an existing entry is always complete and is returned without locking.
+    Otherwise, the entry is built while holding a lock that is specific to its
+    key, so that concurrent builds of different keys do not wait on each other.
+    The lock is released by the OS if the process dies, and the temporary
+    paths of failed or crashed builds are removed by the next build.
+    """
+    entry = root.join(key)
+    if entry.check():
+        return entry
+
+    root.ensure(dir=1)
+    lock = lock_entry(root, key)
+    try:
+        if entry.check():
+            return entry
+
+        remove_stale(root, key)
+        path = temp_path(root, key)
+        try:
+            build(path)
+            os.rename(str(path), str(entry))
+        except BaseException:
+            path.remove(rec=1, ignore_errors=True)
+            raise
+    finally:
+        lock.release()
+    return entry
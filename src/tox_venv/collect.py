@@ -0,0 +1,307 @@
+"""
+Garbage-collect the testenvs and cache entries of a tox work dir, evicting the
+least recently used ones until their total size is under a cap.
+
+This module is also run in the background at the end of a tox run:
+
+    python -m tox_venv.collect <toxworkdir> <size>
+"""
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+import py
+from tox import reporter
+
+from .cache import cache_dir
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+# Touched when an entry is used, and locked (shared) for as long as it is in use.
+USED = '.tox-venv-used'
+
+# The cache dirs whose entries are collected.
+CACHE_ROOTS = ('build', 'shared', 'template')
+
+# The usage locks held by this process, which are released when it exits.
+HELD = []
+
+# The cache dir of the shared pycs, which are collected once no testenv links to them.
+PYC_STORE = 'pycache'
+
+# How long an unlinked shared pyc is kept, as it may have just been compiled for a testenv.
+PYC_GRACE = 3600
+
+# Entries that were active this recently are never evicted, even if they are not locked (e.g., by a run without the
+# plugin, or a run that predates the usage locks).
+ACTIVE_GRACE = 600
+
+# The result of the last collection, which is reported by the next run.
+RESULT = 'gc.json'
+
+
+def format_size(size):
+    for unit in ['', 'K', 'M', 'G']:
+        if size < 1024:
+            break
+        size /= 1024.0
+    else:
+        unit = 'T'
+    return '%.1f%sB' % (size, unit) if unit else '%dB' % size
+
+
+def use_collect(config):
+    return config.option.venv_gc is not None and fcntl is not None
+
+
+def mark_used(path):
+    """
+    Record the use of an entry, and hold a shared lock on it until this process
+    exits, so that it is not evicted by a concurrent collection.
+    """
+    if fcntl is None or not path.check(dir=1):
+        return
+    used = path.join(USED)
+    try:
+        f = io.open(str(used), 'ab')
+    except (IOError, OSError):
+        # e.g., a read-only work dir
+        return
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_SH)
+    except (IOError, OSError):
+        # e.g., no locks on a network file system
+        f.close()
+        return
+    HELD.append(f)
+    try:
+        os.utime(str(used), None)
+    except OSError:
+        # evicted while waiting for the lock
+        pass
+
+
+def mark_testenv(venv):
+    """
+    Record the use of the testenv if the run collects the work dir, so that it
+    is not evicted by a concurrent collection.
+    """
+    if use_collect(venv.envconfig.config):
+        mark_used(venv.path)
+
+
+def lock_unused(path):
+    """
+    Lock an entry for eviction. Returns the locked file, or `None` if the
+    entry is in use.
+    """
+    f = io.open(str(path.join(USED)), 'ab')
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except (IOError, OSError):
+        f.close()
+        return None
+    return f
+
+
+def last_used(path):
+    used = path.join(USED)
+    return (used if used.check() else path).mtime()
+
+
+def last_active(path):
+    """
+    Return the last time the entry, its usage file, creation config or logs
+    were modified.
+    """
+    paths = [path, path.join(USED), path.join('.tox-config1'), path.join('log')]
+    return max(p.mtime() for p in paths if p.check())
+
+
+def disk_usage(path):
+    """
+    Return the size of the files under `path`, without following links and
+    counting hardlinked files once.
+    """
+    seen, size = set(), 0
+    for root, dirs, files in os.walk(str(path)):
+        for name in files + dirs:
+            try:
+                stat = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            if (stat.st_dev, stat.st_ino) in seen:
+                continue
+            seen.add((stat.st_dev, stat.st_ino))
+            size += stat.st_blocks * 512 if hasattr(stat, 'st_blocks') else stat.st_size
+    return size
+
+
+def find_entries(toxworkdir):
+    """
+    Return the collectable entries of the work dir: the testenvs (the dirs
+    with a creation config) and the entries of the plugin's cache dirs.
+    """
+    entries = []
+    for path in toxworkdir.listdir(lambda p: p.check(dir=1, link=0)):
+        if path.join('.tox-config1').check():
+            entries.append(path)
+    for name in CACHE_ROOTS:
+        root = toxworkdir.join('.tox-venv', name)
+        if root.check(dir=1):
+            entries.extend(root.listdir(lambda p: p.check(dir=1, link=0) and '.tmp-' not in p.basename))
+    return entries
+
+
+def linked_entries(path):
+    """
+    Return the real paths of the other entries that the testenv links to.
+    """
+    real = os.path.realpath(str(path))
+    linked = set(
+        os.path.dirname(os.path.realpath(str(link)))
+        for link in path.listdir(lambda p: p.check(link=1))
+    )
+    linked.discard(real)
+    return linked
+
+
+def collect_pycs(toxworkdir, log):
+    """
+    Remove the shared pycs that are no longer hardlinked by any testenv. Returns
+    the number of reclaimed bytes.
+    """
+    reclaimed, count = 0, 0
+    expired = time.time() - PYC_GRACE
+    for root, dirs, files in os.walk(str(toxworkdir.join('.tox-venv', PYC_STORE))):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.lstat(path)
+                # the ctime changes whenever a link is added or removed
+                if stat.st_nlink > 1 or stat.st_ctime > expired:
+                    continue
+                os.unlink(path)
+            except OSError:
+                continue
+            reclaimed += stat.st_size
+            count += 1
+    if count:
+        log('removed %d unlinked pycs (%s)' % (count, format_size(reclaimed)))
+    return reclaimed
+
+
+def collect(toxworkdir, cap, log=None):
+    """
+    Evict the least recently used entries of the work dir until their total size
+    is under `cap` bytes, skipping the entries that are in use. A shared entry
+    is only evicted once no remaining testenv links to it. The shared pycs that
+    are no longer linked are removed regardless of the cap. Returns the number
+    of reclaimed bytes.
+    """
+    log = log or (lambda msg: None)
+    entries = sorted(find_entries(toxworkdir), key=last_used)
+    sizes = dict((entry, disk_usage(entry)) for entry in entries)
+    total = sum(sizes.values())
+    log('%d entries, %s (cap %s)' % (len(entries), format_size(total), format_size(cap)))
+
+    links = dict((entry, linked_entries(entry)) for entry in entries)
+
+    reclaimed = 0
+    for entry in entries:
+        if total - reclaimed <= cap:
+            break
+
+        real = os.path.realpath(str(entry))
+        if any(real in linked for linked in links.values()):
+            log('skipping %s, linked by a testenv' % entry)
+            continue
+        if time.time() - last_active(entry) < ACTIVE_GRACE:
+            log('skipping %s, recently active' % entry)
+            continue
+
+        lock = lock_unused(entry)
+        if lock is None:
+            log('skipping %s, in use' % entry)
+            continue
+        try:
+            # move the entry out of the way first, so it is never seen half-removed
+            trash = entry.new(basename='%s.tmp-gc-%d' % (entry.basename, os.getpid()))
+            entry.rename(trash)
+        finally:
+            lock.close()
+        trash.remove(rec=1, ignore_errors=True)
+
+        del links[entry]
+        reclaimed += sizes[entry]
+        log('evicted %s (%s)' % (entry, format_size(sizes[entry])))
+
+    reclaimed += collect_pycs(toxworkdir, log)
+    log('reclaimed %s' % format_size(reclaimed))
+    return reclaimed
+
+
+def start_collect(config):
+    """
+    Start the collection of the work dir in the background, logging to the
+    plugin's cache dir. The collection inherits the usage locks of this process,
+    so the entries used by the run are not evicted.
+    """
+    if not use_collect(config):
+        return
+
+    # The testenvs of the run are never evicted by its own collection
+    for name in config.envlist:
+        envconfig = config.envconfigs.get(name)
+        if envconfig is not None:
+            mark_used(envconfig.envdir)
+
+    report_last_collect(config)
+    log = cache_dir(config, 'gc.log')
+    log.dirpath().ensure(dir=1)
+    args = [sys.executable, '-m', 'tox_venv.collect', str(config.toxworkdir), str(config.option.venv_gc)]
+    if sys.version_info >= (3, 2):
+        kwargs = {'pass_fds': [f.fileno() for f in HELD]}
+    else:  # pragma: no cover
+        kwargs = {'close_fds': False}
+    with io.open(str(log), 'ab') as f:
+        subprocess.Popen(args, stdout=f, stderr=subprocess.STDOUT, cwd=str(config.toxworkdir), **kwargs)
+    reporter.verbosity1('collecting %s in the background, see %s' % (config.toxworkdir, log))
+
+
+def report_last_collect(config):
+    result = cache_dir(config, RESULT)
+    if not result.check(file=1):
+        return
+    try:
+        with io.open(str(result), encoding='utf-8') as f:
+            data = json.load(f)
+    except ValueError:
+        return
+    reporter.verbosity0('the last collection of %s (%s) reclaimed %s' % (
+        config.toxworkdir, time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(data['finished'])),
+        format_size(data['reclaimed']),
+    ))
+
+
+def main(argv):
+    toxworkdir, cap = py.path.local(argv[0]), int(argv[1])
+
+    def log(msg):
+        sys.stdout.write('%s %s\n' % (time.strftime('%Y-%m-%d %H:%M:%S'), msg))
+        sys.stdout.flush()
+
+    reclaimed = collect(toxworkdir, cap, log)
+    with io.open(str(toxworkdir.join('.tox-venv', RESULT)), 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'finished': time.time(), 'reclaimed': reclaimed}))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,163 @@
+import hashlib
+import io
+import os
+
+from tox.util.path import ensure_empty_dir
+
+from .cache import cache_dir, lock_entry
+from .collect import USED, mark_used
+from .events import emit
+from .failfast import get_run_id
+from .history import get_timings
+
+# Written once the shared environment is fully installed.
+MARKER = '.tox-venv-complete'
+
+# Records the package that is installed into the shared environment.
+PACKAGE_RECORD = '.tox-venv-package'
+
+# Records the run that last created the shared environment, so that `--recreate` only recreates it once per run.
+RECREATED = '.tox-venv-recreated'
+
+# Entries of a testenv's directory that belong to the testenv, not the shared environment.
+PRIVATE = ('log', 'tmp', '.tox-config1', MARKER, PACKAGE_RECORD, RECREATED, USED)
+
+# The variables of `setenv` that affect what is installed (e.g., `PIP_INDEX_URL` or `PIP_CONSTRAINT`).
+INSTALL_VARIABLES = ('PIP_', 'SETUPTOOLS_', 'PYTHONPATH')
+
+
+def fingerprint(venv):
+    """
+    Compute the normalized fingerprint of the testenv's creation config. Testenvs
+    with the same fingerprint are physically identical, and may share a single
+    environment.
+    """
+    envconfig = venv.envconfig
+    parts = [
+        envconfig.python_info.executable,
+        '.'.join(map(str, envconfig.python_info.version_info)),
+        'sitepackages=%d' % envconfig.sitepackages,
+        'alwayscopy=%d' % envconfig.alwayscopy,
+        'usedevelop=%d' % envconfig.usedevelop,
+        'skip_install=%d' % envconfig.skip_install,
+        'pip_pre=%d' % envconfig.pip_pre,
+        'extras=%s' % ','.join(sorted(envconfig.extras)),
+        'install_command=%s' % ' '.join(envconfig.install_command),
+    ]
+    parts.extend('dep=%s' % dep.name for dep in venv.get_resolved_dependencies())
+    setenv = envconfig.setenv.export()
+    parts.extend('setenv=%s=%s' % (key, setenv[key]) for key in sorted(setenv) if key.startswith(INSTALL_VARIABLES))
+
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8') + b'\n')
+    return digest.hexdigest()[:16]
+
+
+def use_dedupe(venv):
+    return venv.envconfig.config.option.venv_dedupe and os.name != 'nt'
+
+
+def link_env(shared, path):
+    """
+    Populate the testenv's directory with links to the shared environment.
+    """
+    for name in os.listdir(str(shared)):
+        if name in PRIVATE or name.endswith('.lock'):
+            continue
+        link = path.join(name)
+        if link.check(link=1) or link.check():
+            link.remove(rec=1, ignore_errors=True)
+        os.symlink(str(shared.join(name)), str(link))
+
+
+def acquire(venv, shared):
+    venv.dedupe_lock = lock_entry(shared.dirpath(), shared.basename)
+
+
+def release(venv):
+    lock = getattr(venv, 'dedupe_lock', None)
+    if lock is not None:
+        lock.release(force=True)
+        venv.dedupe_lock = None
+
+
+def create_deduped(venv, action, create):
+    """
+    Back the testenv with the shared environment for its fingerprint, calling
+    `create(path)` to create the shared environment if it does not exist yet.
+    The shared environment stays locked until the testenv has been installed.
+    Returns `True` if an existing shared environment is reused.
+    """
+    config = venv.envconfig.config
+    shared = cache_dir(config, 'shared', fingerprint(venv))
+    shared.dirpath().ensure(dir=1)
+    acquire(venv, shared)
+
+    # the parallel children of a run are separate processes, so the recreate is recorded in the shared environment
+    run_id = get_run_id(config)
+    recreated = shared.join(RECREATED)
+    reuse = shared.join(MARKER).check() and not (
+        venv.envconfig.recreate and not (recreated.check() and recreated.read() == run_id)
+    )
+    emit(config, 'cache', env=venv.name, cache='shared', key=shared.basename, hit=reuse)
+
+    if reuse:
+        action.setactivity('dedupe-reuse', shared)
+    else:
+        action.setactivity('dedupe-create', shared)
+        ensure_empty_dir(shared)
+        shared.ensure(dir=1)
+        create(shared)
+        recreated.write(run_id)
+
+    link_env(shared, venv.path)
+    mark_used(shared)
+    venv.dedupe_shared = shared
+    venv.dedupe_reused = reuse
+    wrap_install_pkg(venv, shared)
+    return reuse
+
+
+def package_digest(venv, path):
+    if venv.envconfig.usedevelop:
+        return 'develop %s' % venv.envconfig.config.setupdir
+    return hashlib.sha256(path.read_binary()).hexdigest()
+
+
+def wrap_install_pkg(venv, shared):
+    """
+    Skip the package install when the same package is already installed into
+    the shared environment, and mark the shared environment as complete after
+    the install.
+    """
+    record = shared.join(PACKAGE_RECORD)
+
+    def wrap(install):
+        def install_pkg(path, action):
+            digest = package_digest(venv, path)
+            if venv.dedupe_reused and record.check() and record.read() == digest:
+                # the timing wrapper of the install is skipped along with it
+                get_timings(venv).start('install-package')
+                action.setactivity('dedupe-inst', path)
+                venv.finish()
+            else:
+                install(path, action)
+                with io.open(str(record), 'w', encoding='utf-8') as f:
+                    f.write(digest)
+            shared.join(MARKER).ensure()
+            release(venv)
+        return install_pkg
+
+    venv.installpkg = wrap(venv.installpkg)
+    venv.developpkg = wrap(venv.developpkg)
+
+
+def finish_deduped(venv):
+    """
+    Mark the shared environment as complete, and release its lock.
+    """
+    shared = getattr(venv, 'dedupe_shared', None)
+    if shared is not None and getattr(venv, 'status', None) == 0:
+        shared.join(MARKER).ensure()
+    release(venv)
@@ -0,0 +1,190 @@
+"""
+Emit the progress of a run as newline-delimited JSON events, for external
+dashboards. Each event is a single JSON object on its own line, with at least
+the `event` name, the `time`, and the `pid` of the tox process that emits it.
+The parallel children of a run emit their events to the same target.
+"""
+import errno
+import json
+import os
+import socket
+import time
+
+from tox import reporter
+from tox.config.parallel import ENV_VAR_KEY_PRIVATE as PARALLEL_ENV_VAR_KEY_PRIVATE
+
+# A socket reader that stops reading for this long closes the stream.
+SEND_TIMEOUT = 5.0
+
+# The target of an `fd:N` stream, as a path that the parallel children can open.
+INHERITED_TARGET = 'TOX_VENV_EVENTS_TARGET'
+
+
+class EventStream(object):
+    """
+    Writes events to a file descriptor (or a socket). The stream is closed once
+    its reader has gone away, which does not affect the run.
+    """
+
+    def __init__(self, fd, sock=None):
+        self.fd = fd
+        self.sock = sock
+
+    def write(self, event):
+        if self.fd is None:
+            return
+        data = (json.dumps(event, sort_keys=True) + '\n').encode('utf-8')
+        try:
+            if self.sock is not None:
+                self.sock.sendall(data)
+            else:
+                # a single write is atomic for appends, and for pipes up to PIPE_BUF
+                while data:
+                    data = data[os.write(self.fd, data):]
+        except (IOError, OSError) as exception:
+            reporter.verbosity1('closing the event stream - v = %r' % (exception, ))
+            self.close()
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+        elif self.fd is not None:
+            os.close(self.fd)
+        self.fd = self.sock = None
+
+
+def open_stream(target):
+    """
+    Open the event stream for a `--venv-events` target, which is `fd:N` for an
+    open file descriptor, `unix:PATH` for a Unix socket, or the path of a file
+    or FIFO. Returns `None` if a FIFO has no reader.
+    """
+    if target.startswith('fd:'):
+        # Duplicate the descriptor, so that closing the stream leaves it open
+        return EventStream(os.dup(int(target[3:])))
+
+    if target.startswith('unix:'):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(SEND_TIMEOUT)
+        sock.connect(target[5:])
+        return EventStream(sock.fileno(), sock)
+
+    if os.name == 'nt':  # pragma: no cover
+        return EventStream(os.open(target, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644))
+
+    # Opening a FIFO without a reader would block
+    import fcntl
+    try:
+        fd = os.open(target, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_NONBLOCK, 0o644)
+    except OSError as exception:
+        if exception.errno == errno.ENXIO:
+            return None
+        raise
+    fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) & ~os.O_NONBLOCK)
+    return EventStream(fd)
+
+
+def resolve_target(target):
+    """
+    Resolve the target of an `fd:N` stream in a parallel child, which does not
+    inherit the descriptors of its parent. The parent's descriptor is opened
+    through `/proc` instead.
+    """
+    if not target.startswith('fd:'):
+        return target
+    if PARALLEL_ENV_VAR_KEY_PRIVATE in os.environ:
+        return os.environ.get(INHERITED_TARGET, target)
+
+    path = '/proc/%d/fd/%s' % (os.getpid(), target[3:])
+    if os.path.exists(path):
+        os.environ[INHERITED_TARGET] = path
+    return target
+
+
+def get_stream(config):
+    return getattr(config, 'venv_event_stream', None)
+
+
+def emit(config, event, **fields):
+    """
+    Emit an event to the run's event stream, if there is one.
+    """
+    stream = get_stream(config)
+    if stream is None:
+        return
+    fields.update(event=event, time=time.time(), pid=os.getpid())
+    stream.write(fields)
+
+
+def configure_events(config):
+    target = config.option.venv_events
+    try:
+        stream = open_stream(resolve_target(target))
+    except (IOError, OSError, ValueError) as exception:
+        reporter.warning('could not open the event stream %s - v = %r' % (target, exception))
+        return
+    if stream is None:
+        reporter.warning('the event stream %s has no reader' % target)
+        return
+
+    config.venv_event_stream = stream
+    # The parallel children share the stream of the parent, which emits the run's events
+    if PARALLEL_ENV_VAR_KEY_PRIVATE not in os.environ:
+        emit(config, 'run-start', envs=list(config.envlist))
+
+
+def finish_events(config):
+    stream = get_stream(config)
+    if stream is None:
+        return
+    if PARALLEL_ENV_VAR_KEY_PRIVATE not in os.environ:
+        emit(config, 'run-end')
+    stream.close()
+    config.venv_event_stream = None
+
+
+def instrument(venv, timings):
+    """
+    Emit the phase transitions of the testenv, and the subprocesses that it
+    launches through `_pcall`.
+    """
+    config = venv.envconfig.config
+
+    started = []
+
+    def listener(event, **fields):
+        # The parent of a parallel run instruments the testenvs without running them
+        if not started:
+            started.append(True)
+            emit(config, 'env-start', env=venv.name)
+        emit(config, event, env=venv.name, **fields)
+
+    timings.listener = listener
+
+    pcall = venv._pcall
+
+    def _pcall(args, *posargs, **kwargs):
+        action = kwargs.get('action')
+        if action is None:
+            return pcall(args, *posargs, **kwargs)
+
+        processes = []
+        via_popen = action.via_popen
+
+        def popen(*popenargs, **popenkwargs):
+            process = via_popen(*popenargs, **popenkwargs)
+            processes.append((process, time.time()))
+            listener('process-start', action=action.name, activity=action.activity, process=process.pid,
+                     args=[str(arg) for arg in args])
+            return process
+
+        action.via_popen = popen
+        try:
+            return pcall(args, *posargs, **kwargs)
+        finally:
+            action.via_popen = via_popen
+            for process, started in processes:
+                listener('process-end', process=process.pid, returncode=process.returncode,
+                         duration=time.time() - started)
+
+    venv._pcall = _pcall
@@ -0,0 +1,140 @@
+import io
+import os
+import signal
+import threading
+import uuid
+
+from tox import reporter
+from tox.config.parallel import ENV_VAR_KEY_PRIVATE as PARALLEL_ENV_VAR_KEY_PRIVATE
+from tox.config.parallel import OFF_VALUE as PARALLEL_OFF
+
+from .cache import cache_dir
+from .history import run_status
+
+# Identifies a run, and is inherited by the parallel children.
+RUN_ID = 'TOX_VENV_RUN_ID'
+
+# The interval at which the parallel parent checks for failures.
+POLL_INTERVAL = 0.2
+
+
+def get_run_id(config):
+    """
+    Return the identifier of the run. It is generated by the tox process that
+    started the run, and inherited by the parallel children.
+    """
+    if PARALLEL_ENV_VAR_KEY_PRIVATE in os.environ and RUN_ID in os.environ:
+        return os.environ[RUN_ID]
+    if getattr(config, 'venv_run_id', None) is None:
+        config.venv_run_id = uuid.uuid4().hex
+        if config.option.parallel != PARALLEL_OFF:
+            os.environ[RUN_ID] = config.venv_run_id
+    return config.venv_run_id
+
+
+def use_fail_fast(config):
+    return config.option.venv_fail_fast and RUN_ID in os.environ
+
+
+def get_sentinel(config):
+    """
+    Return the sentinel file of the parallel run, which is written by the first
+    child whose testenv fails.
+    """
+    return cache_dir(config, 'cancel', os.environ[RUN_ID])
+
+
+def is_cancelled(config):
+    return use_fail_fast(config) and get_sentinel(config).check(file=1)
+
+
+def interrupt_main():
+    if os.name == 'nt':  # pragma: no cover
+        try:
+            import _thread as thread
+        except ImportError:
+            import thread
+        thread.interrupt_main()
+    else:
+        os.kill(os.getpid(), signal.SIGINT)
+
+
+def watch(config, stopped):
+    sentinel = get_sentinel(config)
+    while not stopped.wait(POLL_INTERVAL):
+        if sentinel.check(file=1):
+            with io.open(str(sentinel), encoding='utf-8') as f:
+                name = f.read().strip()
+            reporter.error('%s failed, cancelling the remaining testenvs (fail-fast)' % name)
+            # tox stops its parallel children on a keyboard interrupt
+            interrupt_main()
+            return
+
+
+def configure_fail_fast(config):
+    """
+    Start watching for failed testenvs in the parent of a parallel run. The
+    children inherit the run's identifier from the environment.
+    """
+    if not config.option.venv_fail_fast or config.option.parallel == PARALLEL_OFF:
+        return
+    if PARALLEL_ENV_VAR_KEY_PRIVATE in os.environ:
+        return
+
+    get_run_id(config)
+    stopped = threading.Event()
+    watcher = threading.Thread(target=watch, args=(config, stopped))
+    watcher.daemon = True
+    watcher.start()
+    config.venv_fail_fast_watcher = (watcher, stopped)
+
+
+def check_cancelled(venv):
+    """
+    Cancel the testenv if another testenv of the parallel run has failed.
+    """
+    if is_cancelled(venv.envconfig.config):
+        venv.status = 'keyboardinterrupt'
+        raise KeyboardInterrupt
+
+
+def report_failure(venv):
+    """
+    Write the sentinel of the parallel run if the testenv has failed.
+    """
+    config = venv.envconfig.config
+    if not use_fail_fast(config) or run_status(venv) != 'failed':
+        return
+
+    sentinel = get_sentinel(config)
+    if not sentinel.check():
+        sentinel.dirpath().ensure(dir=1)
+        with io.open(str(sentinel), 'w', encoding='utf-8') as f:
+            f.write(venv.name)
+
+
+def cleanup_cancelled(venv):
+    """
+    Remove the directory of a testenv whose creation was cancelled. A testenv
+    is only complete once tox has written its creation config.
+    """
+    if not is_cancelled(venv.envconfig.config) or getattr(venv, 'status', None) != 'keyboardinterrupt':
+        return
+    if venv.path.check(dir=1) and not venv.path_config.check():
+        reporter.verbosity1('removing partial testenv %s' % venv.path)
+        venv.path.remove(rec=1, ignore_errors=True)
+
+
+def finish_fail_fast(config):
+    """
+    Stop watching for failed testenvs, and remove the run's sentinel.
+    """
+    watcher = getattr(config, 'venv_fail_fast_watcher', None)
+    if watcher is None:
+        return
+
+    thread, stopped = watcher
+    stopped.set()
+    thread.join()
+    config.venv_fail_fast_watcher = None
+    get_sentinel(config).remove(ignore_errors=True)
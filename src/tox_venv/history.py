@@ -0,0 +1,356 @@
+import hashlib
+import time
+
+import tox
+from tox import reporter
+
+from .cache import cache_dir
+from .usage import delta, merge, record_usage, snapshot
+
+# Written to the plugin's cache, so that it is shared by the runs of a tox work dir.
+DATABASE = 'history.sqlite'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    env TEXT NOT NULL,
+    interpreter TEXT NOT NULL,
+    config TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS phases (
+    run INTEGER NOT NULL REFERENCES runs (id),
+    position INTEGER NOT NULL,
+    phase TEXT NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS imports (
+    run INTEGER NOT NULL REFERENCES runs (id),
+    module TEXT NOT NULL,
+    processes INTEGER NOT NULL,
+    cumulative REAL NOT NULL,
+    self REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_key ON runs (env, interpreter, config);
+"""
+
+# The testenv settings that are part of the config hash.
+CONFIG_ATTRS = (
+    'basepython',
+    'deps',
+    'commands_pre',
+    'commands',
+    'commands_post',
+    'extras',
+    'install_command',
+    'usedevelop',
+    'skip_install',
+    'sitepackages',
+    'alwayscopy',
+    'pip_pre',
+)
+
+# Set by tox to a random value on each run, unless it is fixed with `--hashseed`.
+VOLATILE_SETENV = ('PYTHONHASHSEED', )
+
+
+class Timings(object):
+    """
+    The phase timings of a testenv's run. A phase lasts until the next phase
+    starts, as some phases end in tox itself rather than in a plugin hook.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.started_usage = snapshot()
+        self.phases = []
+        # The resource usage of the subprocesses of each phase
+        self.usage = {}
+        self.current = None
+        self.current_usage = None
+        self.recorded = False
+        # Called with the phase transitions, e.g. to emit them as events
+        self.listener = None
+
+    def start(self, phase):
+        self.stop()
+        self.current = (phase, time.time())
+        self.current_usage = snapshot()
+        if self.listener is not None:
+            self.listener('phase-start', phase=phase)
+
+    def stop(self):
+        if self.current is not None:
+            phase, started = self.current
+            self.add(phase, time.time() - started, delta(self.current_usage, snapshot()))
+            self.current = None
+
+    def add(self, phase, duration, usage=None):
+        self.phases.append((phase, duration))
+        if usage is not None:
+            self.usage[phase] = merge(self.usage[phase], usage) if phase in self.usage else usage
+        if self.listener is not None:
+            self.listener('phase-end', phase=phase, duration=duration)
+
+    def duration(self):
+        """
+        Return the total duration of the phases, excluding the timings of the
+        individual commands (which are part of their phase).
+        """
+        return sum(duration for phase, duration in self.phases if '[' not in phase)
+
+
+def get_timings(venv):
+    """
+    Return the `Timings` of the testenv, instrumenting it on first use.
+    """
+    timings = getattr(venv, 'timings', None)
+    if timings is not None:
+        return timings
+
+    timings = venv.timings = Timings()
+
+    def wrap_phase(name, func):
+        def wrapper(*args, **kwargs):
+            timings.start('install-package')
+            return func(*args, **kwargs)
+        setattr(venv, name, wrapper)
+
+    for name in ['installpkg', 'developpkg', 'finishvenv']:
+        wrap_phase(name, getattr(venv, name))
+
+    pcall = venv._pcall
+    commands = [0]
+
+    def _pcall(args, *posargs, **kwargs):
+        if not kwargs.get('is_test_command') or timings.current is None or timings.current[0] != 'commands':
+            return pcall(args, *posargs, **kwargs)
+
+        started, usage = time.time(), snapshot()
+        try:
+            return pcall(args, *posargs, **kwargs)
+        finally:
+            timings.add('commands[%d]' % commands[0], time.time() - started, delta(usage, snapshot()))
+            commands[0] += 1
+
+    venv._pcall = _pcall
+
+    if venv.envconfig.config.option.venv_events:
+        from .events import instrument
+        instrument(venv, timings)
+    return timings
+
+
+def interpreter_fingerprint(venv):
+    """
+    Identify the testenv's interpreter by its executable and version.
+    """
+    info = venv.envconfig.python_info
+    version = '.'.join(map(str, (info.version_info or ())[:3]))
+    digest = hashlib.sha256(('%s\n%s' % (info.executable, version)).encode('utf-8'))
+    return '%s-%s' % (version or 'unknown', digest.hexdigest()[:12])
+
+
+def config_hash(envconfig):
+    """
+    Hash the testenv settings that affect how long a run takes.
+    """
+    digest = hashlib.sha256()
+    for attr in CONFIG_ATTRS:
+        digest.update(('%s=%r\n' % (attr, getattr(envconfig, attr, None))).encode('utf-8'))
+    for name, value in sorted(envconfig.setenv.definitions.items()):
+        if name in VOLATILE_SETENV:
+            continue
+        digest.update(('setenv:%s=%s\n' % (name, value)).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def run_status(venv):
+    status = getattr(venv, 'status', None)
+    if status == 0 or status == 'ignored failed command':
+        return 'ok'
+    if status in ('platform mismatch', 'skipped tests'):
+        return 'skipped'
+    if status == 'keyboardinterrupt':
+        return 'cancelled'
+    if isinstance(status, tox.exception.InterpreterNotFound):
+        if venv.envconfig.config.option.skip_missing_interpreters == 'true':
+            return 'skipped'
+    return 'failed'
+
+
+class History(object):
+    """
+    The SQLite database of past testenv runs.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def connect(self):
+        import sqlite3
+
+        self.path.dirpath().ensure(dir=1)
+        # parallel runs write concurrently, so wait for the database lock
+        connection = sqlite3.connect(str(self.path), timeout=30)
+        connection.executescript(SCHEMA)
+        return connection
+
+    def add_run(self, started, env, interpreter, config, status, duration, phases, imports=()):
+        """
+        Record a run, with its phase timings and the `(module, processes,
+        cumulative, self)` import times of its commands. Returns the run's id.
+        """
+        connection = self.connect()
+        try:
+            with connection:
+                cursor = connection.execute(
+                    'INSERT INTO runs (started, env, interpreter, config, status, duration) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (started, env, interpreter, config, status, duration),
+                )
+                connection.executemany(
+                    'INSERT INTO phases (run, position, phase, duration) VALUES (?, ?, ?, ?)',
+                    [(cursor.lastrowid, i, phase, duration) for i, (phase, duration) in enumerate(phases)],
+                )
+                connection.executemany(
+                    'INSERT INTO imports (run, module, processes, cumulative, self) VALUES (?, ?, ?, ?, ?)',
+                    [(cursor.lastrowid, ) + tuple(row) for row in imports],
+                )
+        finally:
+            connection.close()
+        return cursor.lastrowid
+
+    def runs(self, env=None):
+        """
+        Return the recorded runs as `(id, started, env, interpreter, config,
+        status, duration)` tuples, ordered from oldest to newest.
+        """
+        if not self.path.check(file=1):
+            return []
+
+        connection = self.connect()
+        try:
+            query = 'SELECT id, started, env, interpreter, config, status, duration FROM runs'
+            params = ()
+            if env is not None:
+                query += ' WHERE env = ?'
+                params = (env, )
+            return connection.execute(query + ' ORDER BY started, id', params).fetchall()
+        finally:
+            connection.close()
+
+    def recent_runs(self, env, limit=10):
+        """
+        Return the last runs of a testenv as `(config, status, duration)`
+        tuples, ordered from newest to oldest.
+        """
+        if not self.path.check(file=1):
+            return []
+
+        connection = self.connect()
+        try:
+            return connection.execute(
+                'SELECT config, status, duration FROM runs WHERE env = ? ORDER BY started DESC, id DESC LIMIT ?',
+                (env, limit),
+            ).fetchall()
+        finally:
+            connection.close()
+
+    def phase_durations(self, env, phase, limit=10):
+        """
+        Return the durations of a phase in the last successful runs of a testenv.
+        """
+        if not self.path.check(file=1):
+            return []
+
+        connection = self.connect()
+        try:
+            rows = connection.execute(
+                'SELECT phases.duration FROM phases JOIN runs ON phases.run = runs.id '
+                'WHERE runs.env = ? AND runs.status = ? AND phases.phase = ? '
+                'ORDER BY runs.started DESC, runs.id DESC LIMIT ?',
+                (env, 'ok', phase, limit),
+            ).fetchall()
+        finally:
+            connection.close()
+        return [duration for duration, in rows]
+
+    def phases(self, run):
+        """
+        Return the `(phase, duration)` timings of a run, in order.
+        """
+        connection = self.connect()
+        try:
+            return connection.execute(
+                'SELECT phase, duration FROM phases WHERE run = ? ORDER BY position', (run, ),
+            ).fetchall()
+        finally:
+            connection.close()
+
+    def imports(self, run):
+        """
+        Return the `(module, processes, cumulative, self)` import times of a
+        run, from the slowest import.
+        """
+        connection = self.connect()
+        try:
+            return connection.execute(
+                'SELECT module, processes, cumulative, self FROM imports WHERE run = ? '
+                'ORDER BY cumulative DESC, module', (run, ),
+            ).fetchall()
+        finally:
+            connection.close()
+
+
+def get_history(config):
+    return History(cache_dir(config, DATABASE))
+
+
+def median_duration(venv, phase):
+    """
+    Return the median duration of a phase in the last successful runs of the
+    testenv, or `None` if it is unknown.
+    """
+    try:
+        durations = get_history(venv.envconfig.config).phase_durations(venv.name, phase)
+    except Exception:
+        return None
+    if not durations:
+        return None
+    return sorted(durations)[(len(durations) - 1) // 2]
+
+
+def record_run(venv):
+    """
+    Append the testenv's phase timings to the history, once per run.
+    """
+    timings = getattr(venv, 'timings', None)
+    if timings is None or timings.recorded:
+        return
+    timings.stop()
+    timings.recorded = True
+    if not timings.phases:
+        return
+    record_usage(venv, delta(timings.started_usage, snapshot()), timings.usage)
+    if timings.listener is not None:
+        timings.listener('env-end', status=run_status(venv), duration=timings.duration())
+
+    profile = getattr(venv, 'import_profile', None)
+    imports = []
+    if profile is not None:
+        from .importtime import RECORDED_IMPORTS
+        imports = profile.top(RECORDED_IMPORTS)
+
+    try:
+        get_history(venv.envconfig.config).add_run(
+            timings.started, venv.name, interpreter_fingerprint(venv), config_hash(venv.envconfig),
+            run_status(venv), timings.duration(), timings.phases, imports,
+        )
+    except ImportError:
+        # Python may be built without sqlite3
+        return
+    except Exception as exception:
+        reporter.warning('could not record the run of %s - v = %r' % (venv.name, exception))
@@ -1,8 +1,8 @@
 import os
-import subprocess
 
 import tox
-from tox.venv import cleanup_for_venv
+
+from .options import COMPILE_MODES, ORDERS, parse_size, parse_throttle, parse_timeout
 
 
 def real_python3(python, version_dict):
@@ -32,11 +32,15 @@ def real_python3(python, version_dict):
     do not contain an executable named `python`, so we attempt to derive this
     from the version info. e.g., `python3.6.5`, `python3.6`, then `python3`.
     """
+    import subprocess
+
+    from .spawn import check_output
+
     args = [python, '-c', 'import sys; print(sys.real_prefix)']
 
     # get python prefix
     try:
-        output = subprocess.check_output(args, stderr=subprocess.STDOUT)
+        output = check_output(args, stderr=subprocess.STDOUT)
         prefix = output.decode('UTF-8').strip()
     except subprocess.CalledProcessError:
         # process fails, implies *not* in active virtualenv
@@ -62,8 +66,8 @@ def real_python3(python, version_dict):
 
     # the executable path must exist
     assert path, '\n- '.join(['Could not find interpreter. Attempted:'] + paths)
-    v1 = subprocess.check_output([python, '--version'])
-    v2 = subprocess.check_output([path, '--version'])
+    v1 = check_output([python, '--version'])
+    v2 = check_output([path, '--version'])
     assert v1 == v2, 'Expected versions to match (%s != %s).' % (v1, v2)
 
     return path
@@ -79,37 +83,443 @@ def use_builtin_venv(venv):
     return version is not None and version >= (3, 3)
 
 
-@tox.hookimpl
-def tox_testenv_create(venv, action):
-    # Bypass hook when venv is not available for the target python version
-    if not use_builtin_venv(venv):
-        return
-
+def get_real_executable(venv):
+    """
+    Determine the real python executable for the testenv's interpreter.
+    """
     v = venv.envconfig.python_info.version_info
     version_dict = {'major': v[0], 'minor': v[1], 'micro': v[2]}
 
     config_interpreter = str(venv.getsupportedinterpreter())
-    real_executable = real_python3(config_interpreter, version_dict)
+    return real_python3(config_interpreter, version_dict)
+
 
-    args = [real_executable, '-m', 'venv']
-    if venv.envconfig.sitepackages:
+def venv_args(executable, sitepackages=False, alwayscopy=False):
+    """
+    Build the arguments for creating a virtual environment with the venv module.
+    The path of the environment should be appended to the arguments.
+    """
+    args = [executable, '-m', 'venv']
+    if sitepackages:
         args.append('--system-site-packages')
-    if venv.envconfig.alwayscopy:
+    if alwayscopy:
         args.append('--copies')
+    return args
+
+
+def create_venv(venv, action, args, cwd):
+    """
+    Run the venv creation `args` for the testenv. A creation that is killed by
+    the watchdog is retried once, from an empty directory.
+    """
+    from tox import reporter
+    from tox.util.path import ensure_empty_dir
+
+    from .runner import streamed
+    from .throttle import throttled
+    from .watchdog import StalledError
+
+    watchdog = {
+        'timeout': venv.envconfig.venv_create_timeout,
+        'idle_timeout': venv.envconfig.venv_create_idle_timeout,
+    }
+    if not os.environ.get('_TOX_SKIP_ENV_CREATION_TEST', False) == '1':
+        for retry in [False, True]:
+            try:
+                with throttled(venv, 'create'), streamed(action, watchdog):
+                    venv._pcall(args, venv=False, action=action, cwd=cwd)
+                return
+            except StalledError:
+                if retry:
+                    raise
+                reporter.warning('%s: retrying the creation of %s' % (venv.name, cwd.join(args[-1])))
+                ensure_empty_dir(cwd.join(args[-1]))
+            except KeyboardInterrupt:
+                venv.status = 'keyboardinterrupt'
+                raise
+
+
+@tox.hookimpl
+def tox_addoption(parser):
+    parser.add_argument(
+        '--venv-dedupe',
+        action='store_true',
+        dest='venv_dedupe',
+        help='Back testenvs with identical creation configs by a single, shared environment.',
+    )
+    parser.add_argument(
+        '--venv-fail-fast',
+        action='store_true',
+        dest='venv_fail_fast',
+        help='Cancel the remaining testenvs of a parallel run as soon as one of them fails.',
+    )
+    parser.add_argument(
+        '--venv-throttle',
+        nargs='?',
+        const='auto',
+        type=parse_throttle,
+        dest='venv_throttle',
+        metavar='N',
+        help='Limit the number of testenvs that are created or installed concurrently across tox processes to N '
+             '(auto or missing argument - cpu count). The limit is lowered when the installs slow down or the '
+             'system is overloaded.',
+    )
+    parser.add_argument(
+        '--venv-gc',
+        type=parse_size,
+        dest='venv_gc',
+        metavar='SIZE',
+        help='After the run, evict the least recently used testenvs and cached environments in the background until '
+             'they take up less than SIZE (e.g., 500M or 10G).',
+    )
+    parser.add_argument(
+        '--venv-plan',
+        action='store_true',
+        dest='venv_plan',
+        help='Show how each testenv would be set up (reuse, repair, clone or recreate) and why, with the duration '
+             'estimated from the run history, then exit without running anything.',
+    )
+    parser.add_argument(
+        '--venv-events',
+        dest='venv_events',
+        metavar='TARGET',
+        help='Emit the progress of the run as JSON lines to TARGET: fd:N (an open file descriptor), unix:PATH (a Unix '
+             'socket), or the path of a file or FIFO.',
+    )
+    parser.add_argument(
+        '--venv-importtime',
+        action='store_true',
+        dest='venv_importtime',
+        help="Profile the imports of the testenvs' commands (Python 3.7+), and record the slowest imports in the "
+             'run history.',
+    )
+    parser.add_argument(
+        '--venv-order',
+        choices=ORDERS,
+        dest='venv_order',
+        help='Reorder the testenvs using the recorded run history. With lpt, the testenvs that take the longest are '
+             'started first, which shortens parallel runs. With failed-first, the testenvs that failed or changed '
+             'since their last run are run first.',
+    )
+    parser.add_testenv_attribute(
+        name='venv_sync',
+        type='bool',
+        default=False,
+        help='Synchronise the dependencies of an existing testenv in place when only its deps have changed, '
+             'instead of recreating it.',
+    )
+    parser.add_testenv_attribute(
+        name='venv_lockfile',
+        type='path',
+        default=None,
+        help='Path of a lock file with the exact versions of the installed deps. The lock file is generated on the '
+             'first install, and then used to install the deps without resolving them.',
+    )
+    parser.add_testenv_attribute(
+        name='venv_build_cache',
+        type='bool',
+        default=False,
+        help='Build the package as a wheel in a build environment that is cached and shared across testenvs.',
+    )
+    parser.add_testenv_attribute(
+        name='venv_template',
+        type='bool',
+        default=False,
+        help='Create the testenvs that are not created with venv (e.g., Python 2.7 and PyPy) by cloning a cached '
+             'virtualenv template, instead of running virtualenv for each testenv.',
+    )
+    parser.add_testenv_attribute(
+        name='venv_create_timeout',
+        type='string',
+        default='',
+        help='Kill and retry (once) the creation of the environment if it takes longer than this many seconds.',
+        postprocess=validate_timeout,
+    )
+    parser.add_testenv_attribute(
+        name='venv_create_idle_timeout',
+        type='string',
+        default='',
+        help='Kill and retry (once) the creation of the environment if it produces no output for this many seconds.',
+        postprocess=validate_timeout,
+    )
+    parser.add_testenv_attribute(
+        name='venv_single_install',
+        type='bool',
+        default=False,
+        help='Install the deps and the package with a single pip invocation when creating the testenv.',
+    )
+    parser.add_testenv_attribute(
+        name='venv_shared_pycache',
+        type='bool',
+        default=False,
+        help='Share the pycs of identical sources between the testenvs, using hash-checked pycs (Python 3.7+).',
+    )
+    parser.add_testenv_attribute(
+        name='venv_compile',
+        type='string',
+        default='',
+        help='Byte-compile the installed deps with a pool of workers (parallel), optionally without waiting for the '
+             'compilation to finish before running the commands (background).',
+        postprocess=validate_compile_mode,
+    )
+
+
+def validate_timeout(testenv_config, value):
+    try:
+        return parse_timeout(value)
+    except ValueError:
+        raise tox.exception.ConfigError('timeouts must be a number of seconds, got %r' % value)
+
+
+def validate_compile_mode(testenv_config, value):
+    if value not in COMPILE_MODES:
+        raise tox.exception.ConfigError(
+            'venv_compile must be one of %s, got %r' % (', '.join(repr(m) for m in COMPILE_MODES), value),
+        )
+    return value
+
+
+@tox.hookimpl
+def tox_configure(config):
+    # This hook fires on every tox invocation, so only import what the options use
+    if config.option.venv_order:
+        from .schedule import configure_order
+        configure_order(config)
+    if config.option.venv_plan:
+        from .plan import show_plan
+        show_plan(config)
+        raise SystemExit(0)
+    if config.option.venv_events:
+        from .events import configure_events
+        configure_events(config)
+    if config.option.venv_fail_fast:
+        from .failfast import configure_fail_fast
+        configure_fail_fast(config)
+    if config.option.venv_dedupe:
+        # generate the run's identifier before the parallel children are started
+        from .failfast import get_run_id
+        get_run_id(config)
+
+
+@tox.hookimpl
+def tox_package(session, venv):
+    from .history import get_timings
+
+    get_timings(venv)
+    if not venv.envconfig.venv_build_cache or not use_builtin_venv(venv):
+        return
+
+    from .buildenv import build_package
+    return build_package(session, venv)
+
+
+@tox.hookimpl
+def tox_testenv_create(venv, action):
+    from tox.venv import cleanup_for_venv
+
+    from .collect import mark_testenv
+    from .dedupe import create_deduped, use_dedupe
+    from .failfast import check_cancelled
+    from .history import get_timings
+    from .sync import get_sync_plan
+    from .template import create_from_template, use_template
+
+    timings = get_timings(venv)
+    check_cancelled(venv)
+    timings.start('create')
+    mark_testenv(venv)
+
+    # Bypass hook when venv is not available for the target python version,
+    # unless the virtualenv is cloned from a cached template
+    if not use_builtin_venv(venv):
+        if not use_template(venv):
+            return
+        cleanup_for_venv(venv)
+        create_from_template(venv, action)
+        return True
+
+    # Skip recreation when only the deps have changed
+    venv.sync_plan = None if use_dedupe(venv) else get_sync_plan(venv)
+    if venv.sync_plan is not None:
+        action.setactivity('sync', str(venv.sync_plan))
+        return True
+
+    timings.start('probe')
+    executable = get_real_executable(venv)
+    timings.start('create')
+
+    args = venv_args(
+        executable,
+        sitepackages=venv.envconfig.sitepackages,
+        alwayscopy=venv.envconfig.alwayscopy,
+    )
 
     # Handles making the empty dir for the `venv.path`.
     cleanup_for_venv(venv)
 
+    # Back the testenv with an environment shared by identical testenvs
+    if use_dedupe(venv):
+        venv.path.ensure(dir=1)
+        create_deduped(venv, action, lambda path: create_venv(venv, action, args + [path.basename], path.dirpath()))
+        return True
+
     basepath = venv.path.dirpath()
     basepath.ensure(dir=1)
     args.append(venv.path.basename)
-
-    if not os.environ.get('_TOX_SKIP_ENV_CREATION_TEST', False) == '1':
-        try:
-            venv._pcall(args, venv=False, action=action, cwd=basepath)
-        except KeyboardInterrupt:
-            venv.status = 'keyboardinterrupt'
-            raise
+    create_venv(venv, action, args, basepath)
 
     # Return non-None to indicate the plugin has completed
     return True
+
+
+@tox.hookimpl
+def tox_testenv_install_deps(venv, action):
+    from .collect import mark_testenv
+    from .history import get_timings
+    from .install import install_deps
+    from .pycache import compile_installed, use_compile
+    from .sync import installed_distributions
+    from .throttle import get_throttle, throttle_package_install, throttled
+
+    get_timings(venv).start('install-deps')
+
+    # The testenv was (re)created, which removed its usage file
+    mark_testenv(venv)
+
+    # Deps are already installed into the shared environment
+    if getattr(venv, 'dedupe_reused', False):
+        action.setactivity('dedupe-installdeps', venv.dedupe_shared)
+        return True
+
+    throttle_package_install(venv)
+    extraopts = ['--no-compile'] if use_compile(venv) else []
+    if not extraopts and get_throttle(venv) is None:
+        return install_testenv_deps(venv, action)
+
+    # Install without compiling, then compile the newly installed sources
+    before = installed_distributions(venv.path) if extraopts else None
+    with throttled(venv, 'install-deps'):
+        if not install_testenv_deps(venv, action, extraopts):
+            install_deps(venv, action, extraopts)
+    if extraopts:
+        compile_installed(venv, action, before)
+    return True
+
+
+def install_testenv_deps(venv, action, extraopts=()):
+    """
+    Install the testenv's deps with the plugin's install modes. Returns `None`
+    if none of them apply.
+    """
+    from .install import install_combined, install_deps
+    from .lockfile import get_lockfile, install_locked, locked_pins
+    from .sync import SyncPlan, sync_deps
+
+    plan = getattr(venv, 'sync_plan', None)
+    lockfile = get_lockfile(venv)
+    pins = lockfile.read() if lockfile is not None else None
+
+    # Install from a valid lock file, bypassing the resolver
+    if pins is not None:
+        if plan is not None:
+            sync_deps(venv, action, SyncPlan([], plan.uninstall, []))
+        install_locked(venv, action, pins, extraopts)
+        return True
+
+    if plan is not None:
+        sync_deps(venv, action, plan, extraopts)
+        if lockfile is not None:
+            lockfile.write(locked_pins(venv))
+        return True
+
+    if lockfile is None:
+        if venv.envconfig.venv_single_install and install_combined(venv, action, extraopts):
+            return True
+        return
+
+    # Resolve and install the deps as usual, then lock the result
+    install_deps(venv, action, extraopts)
+    lockfile.write(locked_pins(venv))
+    return True
+
+
+@tox.hookimpl
+def tox_runenvreport(venv, action):
+    from .history import get_timings
+
+    get_timings(venv).start('envreport')
+
+
+@tox.hookimpl
+def tox_runtest_pre(venv):
+    from .collect import mark_testenv
+    from .dedupe import finish_deduped
+    from .failfast import check_cancelled
+    from .history import get_timings
+
+    get_timings(venv).start('commands-pre')
+    mark_testenv(venv)
+    finish_deduped(venv)
+    check_cancelled(venv)
+
+    if venv.envconfig.config.option.venv_importtime:
+        from .importtime import profile_imports
+        profile_imports(venv)
+
+
+@tox.hookimpl
+def tox_runtest(venv, redirect):
+    from .history import get_timings
+
+    get_timings(venv).start('commands')
+
+
+@tox.hookimpl(hookwrapper=True)
+def tox_runtest_post(venv):
+    from .failfast import report_failure
+    from .history import get_timings, record_run
+    from .pycache import wait_compile
+
+    get_timings(venv).start('commands-post')
+    yield
+    wait_compile(venv)
+    if venv.envconfig.config.option.venv_importtime:
+        from .importtime import report_imports
+        report_imports(venv)
+    record_run(venv)
+    report_failure(venv)
+
+
+@tox.hookimpl
+def tox_cleanup(session):
+    config = session.config
+
+    # Only the testenvs that were run are instrumented
+    venvs = [venv for venv in session.venv_dict.values() if getattr(venv, 'timings', None) is not None]
+    if venvs:
+        from .dedupe import finish_deduped
+        from .failfast import cleanup_cancelled, report_failure
+        from .history import record_run
+        from .pycache import wait_compile
+
+    for venv in venvs:
+        finish_deduped(venv)
+        wait_compile(venv)
+        record_run(venv)
+        report_failure(venv)
+        cleanup_cancelled(venv)
+
+    if config.option.venv_fail_fast:
+        from .failfast import finish_fail_fast
+        finish_fail_fast(config)
+
+    if config.option.venv_gc is not None:
+        from tox.config.parallel import ENV_VAR_KEY_PRIVATE as PARALLEL_ENV_VAR_KEY_PRIVATE
+
+        from .collect import start_collect
+        if PARALLEL_ENV_VAR_KEY_PRIVATE not in os.environ:
+            start_collect(config)
+
+    if config.option.venv_events:
+        from .events import finish_events
+        finish_events(config)
@@ -0,0 +1,170 @@
+"""
+Profile the imports of the testenv's commands with `PYTHONPROFILEIMPORTTIME`
+(Python 3.7+). The import times that the Python processes of the commands write
+to stderr are filtered out of the output, and aggregated per testenv.
+"""
+import io
+import os
+import re
+import subprocess
+import sys
+import threading
+
+from tox import reporter
+
+# A line of the `-X importtime` output, e.g. `import time:       412 |       1220 |   json.decoder`.
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S.*)$')
+
+# Written once by each process, before its import times.
+HEADER = re.compile(r'^import time:\s+self \[us\]')
+
+# The number of imports that are reported after the run, and that are recorded in the history.
+REPORTED_IMPORTS = 5
+RECORDED_IMPORTS = 50
+
+# How long to wait for the filtered output of the processes that outlive a command.
+JOIN_TIMEOUT = 1.0
+
+
+def median(values):
+    return sorted(values)[(len(values) - 1) // 2]
+
+
+class ImportProfile(object):
+    """
+    The import times of the Python processes of a testenv's commands. The
+    lines of concurrent processes may interleave, so the times are aggregated
+    per module rather than per process.
+    """
+
+    def __init__(self):
+        self.processes = 0
+        # the cumulative and self times of each module, in microseconds
+        self.cumulative = {}
+        self.own = {}
+        self.toplevel = 0
+
+    def feed(self, line):
+        """
+        Record a line of output. Returns `False` if it is not an import time.
+        """
+        if HEADER.match(line):
+            self.processes += 1
+            return True
+        match = LINE.match(line)
+        if match is None:
+            return False
+
+        own, cumulative, indent, module = match.groups()
+        self.cumulative.setdefault(module, []).append(int(cumulative))
+        self.own.setdefault(module, []).append(int(own))
+        if not indent:
+            self.toplevel += int(cumulative)
+        return True
+
+    def per_process(self):
+        """
+        Return the mean import time of a process, in seconds.
+        """
+        return self.toplevel / 1e6 / self.processes if self.processes else 0.0
+
+    def top(self, limit):
+        """
+        Return the `(module, processes, cumulative, self)` of the imports with
+        the largest median cumulative time, in seconds.
+        """
+        imports = [
+            (module, len(times), median(times) / 1e6, median(self.own[module]) / 1e6)
+            for module, times in self.cumulative.items()
+        ]
+        imports.sort(key=lambda item: (-item[2], item[0]))
+        return imports[:limit]
+
+
+def filter_output(fd, profile, out):
+    """
+    Copy the output of the processes to `out`, except for their import times,
+    which are recorded in the profile.
+    """
+    with io.open(fd, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if not profile.feed(line.rstrip('\n')):
+                out.write(line)
+                out.flush()
+
+
+def get_profile(venv):
+    return getattr(venv, 'import_profile', None)
+
+
+def profile_imports(venv):
+    """
+    Run the testenv's commands with `PYTHONPROFILEIMPORTTIME`, filtering the
+    import times out of their stderr into the testenv's `ImportProfile`.
+    """
+    profile = venv.import_profile = ImportProfile()
+    pcall = venv._pcall
+
+    def _pcall(args, *posargs, **kwargs):
+        action = kwargs.get('action')
+        if not kwargs.get('is_test_command') or action is None:
+            return pcall(args, *posargs, **kwargs)
+
+        filters = []
+        via_popen = action.via_popen
+
+        def popen(*popenargs, **popenkwargs):
+            stdout, stderr = popenkwargs.get('stdout'), popenkwargs.get('stderr')
+            if stderr == subprocess.STDOUT:
+                out = stdout if stdout is not None else sys.stdout
+            else:
+                out = sys.stderr if stderr is None else None
+            if out is None:
+                return via_popen(*popenargs, **popenkwargs)
+
+            # the pipe is not exposed as the process's stderr, so tox doesn't read it
+            read, write = os.pipe()
+            popenkwargs['stderr'] = write
+            popenkwargs['env'] = dict(popenkwargs['env'], PYTHONPROFILEIMPORTTIME='1')
+            try:
+                process = via_popen(*popenargs, **popenkwargs)
+            except BaseException:
+                os.close(read)
+                raise
+            finally:
+                os.close(write)
+
+            thread = threading.Thread(target=filter_output, args=(read, profile, out))
+            thread.daemon = True
+            thread.start()
+            filters.append(thread)
+
+            # finish copying the output before tox closes the log file
+            communicate = process.communicate
+
+            def finish(*args, **kwargs):
+                result = communicate(*args, **kwargs)
+                thread.join(JOIN_TIMEOUT)
+                return result
+            process.communicate = finish
+            return process
+
+        action.via_popen = popen
+        try:
+            return pcall(args, *posargs, **kwargs)
+        finally:
+            action.via_popen = via_popen
+            for thread in filters:
+                thread.join(JOIN_TIMEOUT)
+
+    venv._pcall = _pcall
+
+
+def report_imports(venv):
+    profile = get_profile(venv)
+    if profile is None or not profile.processes:
+        return
+    top = ', '.join('%s %.3fs' % (module, cumulative) for module, _, cumulative, _ in profile.top(REPORTED_IMPORTS))
+    reporter.line('%s imports: %.3fs per process (%d processes), slowest: %s' % (
+        venv.name, profile.per_process(), profile.processes, top,
+    ))
@@ -0,0 +1,64 @@
+def install_deps(venv, action, extraopts=()):
+    """
+    Install the testenv's deps, as tox does by default.
+    """
+    deps = venv.get_resolved_dependencies()
+    if deps:
+        action.setactivity('installdeps', ', '.join(map(str, deps)))
+        venv._install(deps, extraopts=list(extraopts), action=action)
+
+
+def get_package_target(venv):
+    """
+    Return the pip arguments for installing the package into the testenv, or
+    `None` if the package is not installed.
+    """
+    envconfig = venv.envconfig
+    if envconfig.skip_install:
+        return None
+
+    if envconfig.usedevelop:
+        target, prefix = str(envconfig.config.setupdir), ['-e']
+    elif getattr(venv, 'package', None):
+        target, prefix = str(venv.package), []
+    else:
+        return None
+
+    if envconfig.extras:
+        target += '[%s]' % ','.join(envconfig.extras)
+    return prefix + [target]
+
+
+def install_combined(venv, action, extraopts=()):
+    """
+    Install the deps and the package with a single pip invocation, so that pip
+    is only started once and resolves both together. The later package install
+    step still runs (along with the wrappers of the other features), but only
+    records the installation. Returns `False` if there is no package to install.
+    """
+    target = get_package_target(venv)
+    if target is None:
+        return False
+
+    deps = venv.get_resolved_dependencies()
+    if deps:
+        action.setactivity('installdeps', ', '.join(map(str, deps)))
+    name = 'develop-inst' if venv.envconfig.usedevelop else 'inst'
+    action.setactivity(name, target[-1])
+    venv._install(deps + target, extraopts=['--exists-action', 'w'] + list(extraopts), action=action)
+
+    def wrap(install):
+        def install_pkg(path, action):
+            action.setactivity('%s-combined' % name, path)
+            venv.finish()
+            _install = venv._install
+            venv._install = lambda *args, **kwargs: None
+            try:
+                return install(path, action)
+            finally:
+                venv._install = _install
+        return install_pkg
+
+    venv.installpkg = wrap(venv.installpkg)
+    venv.developpkg = wrap(venv.developpkg)
+    return True
@@ -0,0 +1,195 @@
+import hashlib
+import io
+import json
+import os
+
+from .sync import canonical_name, installed_distributions, requirement_name
+
+# Distributions provided by the environment itself, which are not locked
+# unless explicitly requested as deps (mirrors `pip freeze`).
+UNLOCKED = ('pip', 'setuptools', 'wheel', 'distribute')
+
+HEADER = '# tox-venv lockfile for %s, do not edit.\n# key: %s\n'
+
+
+class Lockfile(object):
+    """
+    A per-testenv lock file of exact `name==version` pins. The lock file is keyed
+    by the interpreter and the requested deps, so that it is invalidated when
+    either changes.
+    """
+
+    def __init__(self, path, key, description):
+        self.path = path
+        self.key = key
+        self.description = description
+
+    def read(self):
+        """
+        Return the locked pins, or `None` if the lock file is missing or stale.
+        """
+        if not self.path.check(file=1):
+            return None
+
+        with io.open(str(self.path), encoding='utf-8') as f:
+            lines = [line.strip() for line in f]
+        if ('# key: %s' % self.key) not in lines:
+            return None
+        return [line for line in lines if line and not line.startswith('#')]
+
+    def write(self, pins):
+        content = HEADER % (self.description, self.key) + ''.join('%s\n' % pin for pin in pins)
+        self.path.ensure()
+        with io.open(str(self.path), 'w', encoding='utf-8') as f:
+            f.write(content)
+
+
+def lock_key(config):
+    """
+    Compute the lock key for a creation config, from the interpreter and the
+    resolved deps.
+    """
+    digest = hashlib.sha256()
+    for part in [config.base_resolved_python_sha256, config.base_resolved_python_path]:
+        digest.update(part.encode('utf-8') + b'\n')
+    for _, dep in config.deps:
+        digest.update(dep.encode('utf-8') + b'\n')
+    return digest.hexdigest()
+
+
+def get_lockfile(venv):
+    """
+    Return the `Lockfile` for the testenv, or `None` if locking is disabled or
+    the deps can't be locked (e.g., paths, URLs, or custom index servers).
+    """
+    path = venv.envconfig.venv_lockfile
+    if not path:
+        return None
+
+    for dep in venv.get_resolved_dependencies():
+        if dep.indexserver is not None or requirement_name(dep.name) is None:
+            return None
+
+    config = venv._getliveconfig()
+    return Lockfile(path, lock_key(config), config.base_resolved_python_path)
+
+
+def read_requires(path):
+    """
+    Read the requirements of an installed distribution, from the `Requires-Dist`
+    headers of a `*.dist-info` or the `requires.txt` of an `*.egg-info`. The
+    sections of `requires.txt` are converted to markers.
+    """
+    requires = []
+    metadata = os.path.join(path, 'METADATA')
+    if os.path.isfile(metadata):
+        with io.open(metadata, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if not line.strip():
+                    break
+                key, sep, value = line.partition(':')
+                if sep and key == 'Requires-Dist':
+                    requires.append(value.strip())
+        return requires
+
+    requires_txt = os.path.join(path, 'requires.txt')
+    if not os.path.isfile(requires_txt):
+        return requires
+    marker = None
+    with io.open(requires_txt, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('['):
+                extra, _, condition = line.strip('[]').partition(':')
+                markers = ['extra == "%s"' % extra] if extra else []
+                markers += ['(%s)' % condition] if condition else []
+                marker = ' and '.join(markers) or None
+                continue
+            requires.append('%s; %s' % (line, marker) if marker else line)
+    return requires
+
+
+def is_local(path):
+    """
+    Determine if an installed distribution was installed from a local file or
+    directory (e.g., the package under test), as recorded by its `direct_url.json`.
+    """
+    direct_url = os.path.join(path, 'direct_url.json')
+    if not os.path.isfile(direct_url):
+        return False
+    try:
+        with io.open(direct_url, encoding='utf-8') as f:
+            return json.load(f).get('url', '').startswith('file:')
+    except ValueError:
+        return False
+
+
+def applies(requirement, extras):
+    """
+    Determine if a requirement applies to a distribution installed with the
+    given extras. Markers without an `extra` are not evaluated, as they describe
+    the testenv's interpreter rather than the host's, and the requirement only
+    counts when it is installed.
+    """
+    if requirement.marker is None or 'extra' not in str(requirement.marker):
+        return True
+    return any(requirement.marker.evaluate({'extra': extra}) for extra in sorted(extras) or [''])
+
+
+def dependency_closure(venv, installed):
+    """
+    Return the canonical names of the installed distributions that the testenv's
+    deps require, directly or transitively.
+    """
+    from packaging.requirements import InvalidRequirement, Requirement
+
+    def parse(deps):
+        for dep in deps:
+            try:
+                yield Requirement(dep)
+            except InvalidRequirement:
+                continue
+
+    pending = list(parse(dep.name for dep in venv.get_resolved_dependencies()))
+    closure = {}
+    while pending:
+        requirement = pending.pop()
+        key = canonical_name(requirement.name)
+        extras = set(requirement.extras)
+        if key not in installed or (key in closure and extras <= closure[key]):
+            continue
+        closure[key] = closure.get(key, set()) | extras
+        pending.extend(dep for dep in parse(read_requires(installed[key][2])) if applies(dep, closure[key]))
+    return set(closure)
+
+
+def locked_pins(venv):
+    """
+    Return the sorted `name==version` pins of the testenv's deps and of their
+    installed dependencies. Other distributions in the testenv, such as the
+    package under test or leftovers of removed deps, are not locked. Distributions
+    installed from local files are never locked, as a pin would resolve to
+    whatever the index serves under their name.
+    """
+    installed = installed_distributions(venv.path)
+    requested = set(requirement_name(dep.name) for dep in venv.get_resolved_dependencies())
+    pins = []
+    for key in dependency_closure(venv, installed):
+        name, version, path = installed[key]
+        if (key in UNLOCKED and key not in requested) or is_local(path):
+            continue
+        pins.append((key, '%s==%s' % (name, version)))
+    return [pin for _, pin in sorted(pins)]
+
+
+def install_locked(venv, action, pins, extraopts=()):
+    """
+    Install the locked pins, bypassing dependency resolution.
+    """
+    if not pins:
+        return
+    action.setactivity('installlocked', venv.envconfig.venv_lockfile)
+    options = venv._installopts(venv.envconfig.config.indexserver['default'].url)
+    venv.run_install_command(packages=pins, action=action, options=options + ['--no-deps'] + list(extraopts))
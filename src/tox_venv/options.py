@@ -0,0 +1,45 @@
+"""
+The values and parsers of the plugin's options and settings. This module is
+imported on every tox invocation, so it must not import anything else.
+"""
+COMPILE_MODES = ('', 'parallel', 'background')
+
+ORDERS = ('lpt', 'failed-first')
+
+UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def parse_size(value):
+    """
+    Parse a size such as `500M` or `10G` into bytes.
+    """
+    value = value.strip().upper().rstrip('B')
+    unit = value[-1:] if value[-1:] in UNITS else ''
+    size = int(float(value[:len(value) - len(unit)]) * UNITS[unit])
+    if size < 0:
+        raise ValueError(value)
+    return size
+
+
+def parse_timeout(value):
+    """
+    Parse a timeout in seconds, where an empty value or `0` disables it.
+    """
+    value = float(value or 0)
+    if value < 0:
+        raise ValueError(value)
+    return value or None
+
+
+def parse_throttle(value):
+    """
+    Parse the `--venv-throttle` option, which is either `auto` (the CPU count)
+    or a maximum number of concurrent phases.
+    """
+    if value == 'auto':
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    value = int(value)
+    if value < 1:
+        raise ValueError(value)
+    return value
@@ -0,0 +1,170 @@
+import os
+import sys
+
+import py
+import tox
+from tox import reporter
+from tox.interpreters.py_spec import CURRENT, PythonSpec
+from tox.venv import CreationConfig, VirtualEnv, getdigest
+
+from .dedupe import use_dedupe
+from .history import median_duration
+from .sync import installed_distributions, plan_sync
+from .template import use_template
+
+# The phases of a run that follow the creation of the testenv.
+RUN_PHASES = ('install-package', 'envreport', 'commands-pre', 'commands', 'commands-post')
+
+# The phases of a run for each planned action.
+ACTION_PHASES = {
+    'reuse': RUN_PHASES,
+    'repair': ('install-deps', ) + RUN_PHASES,
+    'clone': ('create', 'install-deps') + RUN_PHASES,
+    'recreate': ('probe', 'create', 'install-deps') + RUN_PHASES,
+}
+
+
+class EnvPlan(object):
+    """
+    The planned action for a testenv, the reason for it, and the estimated
+    duration of the testenv's run (`None` if unknown).
+    """
+
+    def __init__(self, name, action, reason, estimate):
+        self.name = name
+        self.action = action
+        self.reason = reason
+        self.estimate = estimate
+
+    def __repr__(self):
+        return '<EnvPlan %s %s>' % (self.name, self.action)
+
+
+def spec_version(spec):
+    if spec.major is None:
+        return None
+    return (spec.major, spec.minor) if spec.minor is not None else (spec.major, )
+
+
+def resolve_interpreter(envconfig, previous):
+    """
+    Resolve the executable and the version of the testenv's interpreter without
+    running it, unlike tox. Returns `(executable, version)`, where either may
+    be `None` if unknown.
+
+    The executable is the `basepython` if it is a path, or the interpreter that
+    runs tox if it satisfies the `basepython`, as tox does. Otherwise, the
+    interpreter that the testenv was created with is assumed if its name
+    satisfies the `basepython`, and the interpreter is looked up on the `PATH`
+    if not.
+    """
+    spec = PythonSpec.from_name(envconfig.basepython)
+    if spec.is_abs:
+        return spec.path, spec_version(PythonSpec.from_name(os.path.basename(spec.path)))
+    if spec.name is not None and CURRENT.satisfies(spec):
+        return CURRENT.path, tuple(sys.version_info[:2])
+
+    if previous is not None and os.path.isfile(previous.base_resolved_python_path):
+        path = previous.base_resolved_python_path
+        if PythonSpec.from_name(os.path.basename(path)).satisfies(spec):
+            return path, spec_version(spec)
+
+    path = py.path.local.sysfind(envconfig.basepython)
+    return (str(path) if path is not None else None), spec_version(spec)
+
+
+def live_config(venv, executable):
+    """
+    Build the testenv's creation config for the resolved `executable`, as in
+    `VirtualEnv._getliveconfig`.
+    """
+    envconfig = venv.envconfig
+    deps = [(getdigest(dep.name), dep.name) for dep in venv.get_resolved_dependencies()]
+    return CreationConfig(
+        getdigest(executable), executable, tox.__version__,
+        envconfig.sitepackages, envconfig.usedevelop, deps, envconfig.alwayscopy,
+    )
+
+
+def uses_builtin_venv(version):
+    """
+    Determine if the testenv would be created with the builtin venv module, as
+    in `use_builtin_venv`. An unknown version is assumed to be recent.
+    """
+    return version is None or version == (3, ) or version >= (3, 3)
+
+
+def decide(venv, previous, executable, version):
+    """
+    Decide how the testenv will be set up, using the checks of tox and of
+    `tox_testenv_create`. Returns `(action, reason)`.
+    """
+    envconfig = venv.envconfig
+    builtin = uses_builtin_venv(version)
+    creation = 'clone' if not builtin and use_template(venv) else 'recreate'
+
+    if envconfig.recreate:
+        return creation, '-r flag'
+    if previous is None:
+        return creation, 'no previous config %s' % venv.path_config
+    if executable is None:
+        return creation, 'interpreter %s not found' % envconfig.basepython
+
+    live = live_config(venv, executable)
+    deps_subset_match = getattr(envconfig, 'deps_matches_subset', False)
+    matches, reason = previous.matches_with_reason(live, deps_subset_match)
+    if matches:
+        return 'reuse', None
+
+    if builtin and envconfig.venv_sync and not use_dedupe(venv):
+        sync_plan = plan_sync(previous, live, installed_distributions(venv.path))
+        if sync_plan is not None:
+            return 'repair', str(sync_plan) or reason
+    return creation, reason
+
+
+def estimate(venv, action):
+    """
+    Estimate the duration of the testenv's run from the median durations of
+    the action's phases in its recorded runs.
+    """
+    durations = [median_duration(venv, phase) for phase in ACTION_PHASES[action]]
+    durations = [duration for duration in durations if duration is not None]
+    return sum(durations) if durations else None
+
+
+def plan_env(venv):
+    previous = CreationConfig.readconfig(venv.path_config)
+    executable, version = resolve_interpreter(venv.envconfig, previous)
+    action, reason = decide(venv, previous, executable, version)
+    return EnvPlan(venv.name, action, reason, estimate(venv, action))
+
+
+def get_plan(config):
+    """
+    Plan the setup of the testenvs of the run, in the order they would run.
+    """
+    plans = []
+    for name in config.envlist:
+        envconfig = config.envconfigs.get(name)
+        if envconfig is not None:
+            plans.append(plan_env(VirtualEnv(envconfig=envconfig)))
+    return plans
+
+
+def format_estimate(seconds):
+    return 'unknown' if seconds is None else '%.1fs' % seconds
+
+
+def show_plan(config):
+    plans = get_plan(config)
+    width = max([len(plan.name) for plan in plans] + [0])
+    for plan in plans:
+        reason = ' - %s' % plan.reason if plan.reason else ''
+        reporter.line('%s  %-8s %8s%s' % (plan.name.ljust(width), plan.action, format_estimate(plan.estimate), reason))
+
+    known = [plan.estimate for plan in plans if plan.estimate is not None]
+    summary = 'estimated %s in total' % format_estimate(sum(known))
+    if len(known) < len(plans):
+        summary += ' (%d testenvs without recorded runs)' % (len(plans) - len(known))
+    reporter.line(summary)
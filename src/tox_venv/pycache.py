@@ -0,0 +1,114 @@
+import io
+import os
+import subprocess
+
+from tox import reporter
+
+from .cache import cache_dir
+from .sync import installed_distributions
+
+# The list of sources to compile, written to the testenv's directory.
+COMPILE_LIST = '.tox-venv-compile'
+
+# The cache dir of the shared pycs.
+PYC_STORE = 'pycache'
+
+
+def use_shared_pycache(venv):
+    """
+    Determine if the testenv shares its pycs, which requires the hash-checked
+    pycs of Python 3.7.
+    """
+    version = venv.envconfig.python_info.version_info
+    return venv.envconfig.venv_shared_pycache and version is not None and version >= (3, 7)
+
+
+def compile_mode(venv):
+    """
+    Return the compile mode of the testenv, ignoring modes that are not supported
+    by its interpreter (the worker pool requires Python 3.5).
+    """
+    version = venv.envconfig.python_info.version_info
+    if version is None or version < (3, 5):
+        return ''
+    return venv.envconfig.venv_compile
+
+
+def use_compile(venv):
+    """
+    Determine if the plugin byte-compiles the installed deps, instead of pip.
+    """
+    return bool(use_shared_pycache(venv) or compile_mode(venv))
+
+
+def installed_sources(envdir, before):
+    """
+    Return the Python sources of the distributions that were installed or
+    changed since the `before` snapshot of `installed_distributions`.
+    """
+    sources = []
+    for key, (_, version, path) in sorted(installed_distributions(envdir).items()):
+        if before.get(key, (None, None, None))[1:] == (version, path):
+            continue
+        record = os.path.join(path, 'RECORD')
+        if not os.path.isfile(record):
+            continue
+        site_packages = os.path.dirname(path)
+        with io.open(record, encoding='utf-8') as f:
+            for line in f:
+                source = line.rsplit(',', 2)[0]
+                if source.endswith('.py') and not source.startswith('..'):
+                    sources.append(os.path.join(site_packages, source))
+    return sources
+
+
+def compile_installed(venv, action, before):
+    """
+    Byte-compile the deps that were installed since the `before` snapshot. With
+    a shared pycache, the pycs are checked against the source hash instead of its
+    mtime, and are hardlinked from the plugin's pyc store, where they are keyed
+    by the magic number and the source hash. In `parallel` and `background`
+    modes the sources are compiled by a pool of workers, and in `background`
+    mode the compilation is not waited for.
+
+    Only the sources listed in the `RECORD` of new or changed distributions are
+    compiled, so the sources that are already compiled are not compiled again.
+    """
+    sources = installed_sources(venv.path, before)
+    if not sources:
+        return
+
+    compile_list = venv.path.join(COMPILE_LIST)
+    with io.open(str(compile_list), 'w', encoding='utf-8') as f:
+        f.write(u''.join(u'%s\n' % source for source in sources))
+
+    mode = compile_mode(venv)
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bytecompile.py')
+    args = [str(venv.envconfig.envpython), script, str(compile_list), '0' if mode else '1']
+    if use_shared_pycache(venv):
+        args.extend(['checked-hash', str(cache_dir(venv.envconfig.config, PYC_STORE).ensure(dir=1))])
+
+    action.setactivity('compile', '%d files (%s)' % (len(sources), mode or 'serial'))
+    if mode != 'background':
+        venv._pcall(args, cwd=venv.envconfig.config.toxinidir, action=action)
+        return
+
+    log = venv.envconfig.envlogdir.ensure(dir=1).join('compile.log')
+    with io.open(str(log), 'wb') as f:
+        venv.compile_process = subprocess.Popen(
+            args, cwd=str(venv.envconfig.config.toxinidir), env=venv._get_os_environ(),
+            stdout=f, stderr=subprocess.STDOUT,
+        )
+
+
+def wait_compile(venv):
+    """
+    Wait for the testenv's background compilation, if any.
+    """
+    process = getattr(venv, 'compile_process', None)
+    if process is None:
+        return
+
+    if process.wait():
+        reporter.warning('byte-compilation failed, see %s' % venv.envconfig.envlogdir.join('compile.log'))
+    venv.compile_process = None
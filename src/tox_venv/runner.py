@@ -0,0 +1,168 @@
+import contextlib
+import functools
+import io
+import mmap
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import py
+from tox import reporter
+from tox.action import shlex_quote
+from tox.exception import InvocationError
+from tox.reporter import Verbosity
+
+from .watchdog import StalledError, Watchdog
+
+# The number of output lines that are kept for the error report and the result log.
+TAIL_LINES = 50
+
+# The size of the reads when following the output, and the interval between them.
+CHUNK_SIZE = 65536
+FOLLOW_INTERVAL = 0.1
+
+# The internals of tox's `Action` that the streamed runner relies on. Where they are missing, the commands are run
+# with `Action.popen` as usual.
+ACTION_INTERNALS = ('_rewrite_args', 'evaluate_cmd', 'command_log', 'get_log_path', 'via_popen')
+
+
+def tail(path, lines=TAIL_LINES, offset=0):
+    """
+    Return the last `lines` lines of the log file, after the first `offset`
+    bytes. The file is mapped into memory, so only the tail is read.
+    """
+    with io.open(str(path), 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= offset:
+            return ''
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            end = size - 1 if data[size - 1:size] == b'\n' else size
+            start = end
+            for _ in range(lines):
+                start = data.rfind(b'\n', offset, start)
+                if start < 0:
+                    break
+            return data[max(start + 1, offset):size].decode('utf-8', 'replace')
+        finally:
+            data.close()
+
+
+def follow(fin, stopped):
+    """
+    Copy the output that is appended to the log file to the terminal, until
+    `stopped` is set.
+    """
+    out = getattr(sys.stdout, 'buffer', sys.stdout)
+    while True:
+        data = fin.read(CHUNK_SIZE)
+        if data:
+            out.write(data)
+            out.flush()
+        elif stopped.is_set():
+            return
+        else:
+            time.sleep(FOLLOW_INTERVAL)
+
+
+def wait(action, process, fin, verbose=False):
+    """
+    Wait for the process, stopping it on a keyboard interrupt. With `verbose`,
+    its output is followed on the terminal.
+    """
+    if not verbose:
+        action.evaluate_cmd(fin, process, True)
+        return
+
+    stopped = threading.Event()
+    follower = threading.Thread(target=follow, args=(fin, stopped))
+    follower.daemon = True
+    follower.start()
+    try:
+        action.evaluate_cmd(fin, process, True)
+    finally:
+        stopped.set()
+        follower.join()
+
+
+def write_header(f, action, cmd, cwd):
+    parts = [action.name, action.msg, str(cwd), cmd]
+    header = u'action: %s, msg: %s\ncwd: %s\ncmd: %s\n' % tuple(part.replace('\n', ' ') for part in parts)
+    f.write(header.encode('utf-8'))
+    f.flush()
+    return f.tell()
+
+
+def popen_logged(action, args, cwd=None, env=None, redirect=True, ignore_ret=False, callback=None, watchdog=None,
+                 **kwargs):
+    """
+    Run a command like `Action.popen`, streaming its output directly to a log
+    file instead of reading the whole log back into memory. Only the tail of
+    the log is read back: it is shown on failure, and recorded in the result
+    log. With `-vv`, the output is also followed on the terminal.
+
+    The `watchdog` settings (`timeout` and `idle_timeout`) kill the command
+    if it hangs, raising a `StalledError`.
+    """
+    cwd = py.path.local() if cwd is None else cwd
+    args = [str(arg) for arg in action._rewrite_args(cwd, args)]
+    cmd = ' '.join(shlex_quote(arg) for arg in args)
+    redirect = redirect and reporter.verbosity() < Verbosity.DEBUG
+
+    path = action.get_log_path(action.name)
+    with io.open(str(path), 'wb') as stdout, io.open(str(path), 'rb') as fin:
+        offset = write_header(stdout, action, cmd, cwd)
+        fin.seek(offset)
+        stalled = None
+        try:
+            process = action.via_popen(
+                args, stdout=stdout, stderr=subprocess.STDOUT, cwd=str(cwd),
+                env=os.environ.copy() if env is None else env, universal_newlines=True, shell=False,
+                creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if sys.platform == 'win32' else 0,
+            )
+        except OSError as exception:
+            exit_code = exception.errno
+        else:
+            if callback is not None:
+                callback(process)
+            reporter.log_popen(cwd, path, cmd, process.pid)
+            with Watchdog(process, path, **watchdog or {}) as dog:
+                wait(action, process, fin, verbose=not redirect)
+            exit_code = process.returncode
+            if dog.reason is not None:
+                stalled = dog
+                stdout.write(('\nkilled by the watchdog (%s):\n%s' % (dog.reason, dog.diagnostics)).encode('utf-8'))
+
+    output = tail(path, offset=offset)
+    action.command_log.add_command(args, output, exit_code)
+    if stalled is not None:
+        reporter.error('%s: %s, killed (logfile: %s)' % (action.name, stalled.reason, path))
+        reporter.verbosity1(stalled.diagnostics)
+        raise StalledError(cmd, exit_code, output)
+    if exit_code and not ignore_ret:
+        reporter.error('invocation failed (exit code %d), logfile: %s' % (exit_code, path))
+        reporter.separator('=', 'log tail', Verbosity.QUIET)
+        reporter.quiet(output)
+        reporter.separator('=', 'log end', Verbosity.QUIET)
+        raise InvocationError(cmd, exit_code, output)
+    return output
+
+
+@contextlib.contextmanager
+def streamed(action, watchdog=None):
+    """
+    Stream the output of the commands that are run by the action to its logs,
+    watching them with the `watchdog` settings. This has no effect with the
+    versions of tox whose `Action` lacks the internals used by the runner.
+    """
+    if not all(hasattr(action, name) for name in ACTION_INTERNALS):
+        yield
+        return
+
+    action.popen = functools.partial(popen_logged, action, watchdog=watchdog)
+    try:
+        yield
+    finally:
+        del action.popen
@@ -0,0 +1,82 @@
+from tox import reporter
+
+from .history import config_hash, get_history
+
+
+def expected_duration(runs, config):
+    """
+    Estimate the duration of a testenv's next run from its `recent_runs`, as
+    the median duration of the successful runs. The runs with the current
+    config hash are preferred. Returns `None` for testenvs without runs.
+    """
+    runs = [run for run in runs if run[1] == 'ok']
+    durations = sorted(duration for run_config, _, duration in runs if run_config == config)
+    if not durations:
+        durations = sorted(duration for _, _, duration in runs)
+    if not durations:
+        return None
+    return durations[(len(durations) - 1) // 2]
+
+
+def order_lpt(envlist, durations):
+    """
+    Order the testenvs longest processing time first. Testenvs without an
+    expected duration are started first, as they are likely to be created
+    from scratch. Otherwise, the original order is kept.
+    """
+    def key(item):
+        position, name = item
+        duration = durations.get(name)
+        return (duration is not None, -(duration or 0), position)
+
+    return [name for _, name in sorted(enumerate(envlist), key=key)]
+
+
+def order_failed_first(envlist, runs, configs):
+    """
+    Order the testenvs whose last run failed first, quickest first, followed
+    by the testenvs that changed since their last run (or have never run).
+    Otherwise, the original order is kept.
+    """
+    def key(item):
+        position, name = item
+        recent = runs.get(name) or []
+        if recent and recent[0][1] == 'failed':
+            duration = expected_duration(recent, configs[name])
+            return (0, duration is None, duration or 0, position)
+        if not recent or recent[0][0] != configs[name]:
+            return (1, False, 0, position)
+        return (2, False, 0, position)
+
+    return [name for _, name in sorted(enumerate(envlist), key=key)]
+
+
+def configure_order(config):
+    """
+    Reorder the testenvs of the run, as requested by `--venv-order`.
+    """
+    order = config.option.venv_order
+    if not order or len(config.envlist) < 2:
+        return
+
+    history = get_history(config)
+    try:
+        runs, configs = {}, {}
+        for name in config.envlist:
+            envconfig = config.envconfigs.get(name)
+            if envconfig is not None:
+                runs[name] = history.recent_runs(name)
+                configs[name] = config_hash(envconfig)
+    except ImportError:
+        # Python may be built without sqlite3
+        return
+    except Exception as exception:
+        reporter.warning('could not read the run history - v = %r' % (exception, ))
+        return
+
+    if order == 'failed-first':
+        config.envlist = order_failed_first(config.envlist, runs, configs)
+    else:
+        durations = dict((name, expected_duration(runs[name], configs[name])) for name in runs)
+        config.envlist = order_lpt(config.envlist, durations)
+    reporter.verbosity1('venv order (%s): %s' % (order, ', '.join(config.envlist)))
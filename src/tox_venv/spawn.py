@@ -0,0 +1,59 @@
+"""
+Launch the plugin's own short-lived subprocesses (such as the interpreter probes)
+with `posix_spawn`, which does not copy the page tables of the tox process. The
+cost of a `fork` grows with the memory of the parent process, which is large
+for configs with many testenvs.
+"""
+import os
+import signal
+import subprocess
+
+
+def use_posix_spawn():
+    return hasattr(os, 'posix_spawnp')
+
+
+def exit_code(status):
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def check_output(args, stderr=None):
+    """
+    Run `args` and return its output, like `subprocess.check_output`. Only
+    `stderr=subprocess.STDOUT` is supported besides the default. Falls back to
+    `subprocess` where `posix_spawn` is not available (Python < 3.8, Windows).
+    """
+    if not use_posix_spawn():
+        return subprocess.check_output(args, stderr=stderr)
+
+    # the pipe is not inherited, the duplicated descriptors are
+    read, write = os.pipe()
+    file_actions = [(os.POSIX_SPAWN_DUP2, write, 1)]
+    if stderr == subprocess.STDOUT:
+        file_actions.append((os.POSIX_SPAWN_DUP2, write, 2))
+    try:
+        pid = os.posix_spawnp(args[0], args, os.environ, file_actions=file_actions)
+    except BaseException:
+        os.close(read)
+        raise
+    finally:
+        os.close(write)
+
+    chunks = []
+    try:
+        with os.fdopen(read, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                chunks.append(chunk)
+    except BaseException:
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+        raise
+
+    output = b''.join(chunks)
+    _, status = os.waitpid(pid, 0)
+    returncode = exit_code(status)
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, args, output)
+    return output
@@ -0,0 +1,202 @@
+"""
+Show the recorded testenv timings of a tox work dir.
+
+    tox-venv-stats [-c tox.ini] [--workdir .tox] [-e ENV] [--last N] [--phases] [--imports]
+"""
+import argparse
+import sys
+import time
+
+import py
+
+from .history import DATABASE, History
+
+# A run is a regression when it is slower than the median of the previous runs by this factor.
+REGRESSION_FACTOR = 1.25
+
+# The minimum number of previous runs needed to detect a regression.
+REGRESSION_RUNS = 3
+
+# The number of the slowest imports of the last run that are shown.
+IMPORT_ROWS = 10
+
+
+def percentile(values, percent):
+    """
+    Return the nearest-rank percentile of the values.
+    """
+    values = sorted(values)
+    if not values:
+        return None
+    rank = max(int(-(-percent * len(values) // 100)), 1)
+    return values[rank - 1]
+
+
+def trend(durations, window=5):
+    """
+    Return the relative change between the mean of the last `window` durations
+    and the mean of the `window` durations before them, or `None` if there
+    aren't enough durations.
+    """
+    if len(durations) < 2 * window:
+        return None
+    previous = sum(durations[-2 * window:-window]) / window
+    recent = sum(durations[-window:]) / window
+    return (recent - previous) / previous if previous else None
+
+
+def is_regression(durations):
+    """
+    Determine if the last duration is a regression from the ones before it.
+    """
+    if len(durations) <= REGRESSION_RUNS:
+        return False
+    median = percentile(durations[:-1], 50)
+    return durations[-1] > median * REGRESSION_FACTOR
+
+
+def group_runs(runs):
+    """
+    Group the runs by their `(env, interpreter, config)` key.
+    """
+    groups = {}
+    for run in runs:
+        groups.setdefault(tuple(run[2:5]), []).append(run)
+    return groups
+
+
+def format_seconds(seconds, precision=1):
+    return '-' if seconds is None else '%.*fs' % (precision, seconds)
+
+
+def format_trend(change):
+    return '-' if change is None else '%+.0f%%' % (change * 100)
+
+
+def report(history, env=None, last=None, phases=False, imports=False, out=None):
+    """
+    Write a report of the runs in the history, and return the number of keys
+    (and imports) whose last run is a regression.
+    """
+    out = out or sys.stdout
+    groups = group_runs(history.runs(env))
+    if not groups:
+        out.write('no runs recorded in %s\n' % history.path)
+        return 0
+
+    header = ('env', 'interpreter', 'config', 'runs', 'last', 'p50', 'p95', 'trend', '')
+    rows = []
+    regressions = 0
+    for (env, interpreter, config), runs in sorted(groups.items()):
+        runs = [run for run in runs if run[5] == 'ok'] or runs
+        if last:
+            runs = runs[-last:]
+        durations = [run[6] for run in runs]
+        regression = is_regression(durations)
+        regressions += regression
+        rows.append((
+            env, interpreter, config[:8], str(len(runs)), format_seconds(durations[-1]),
+            format_seconds(percentile(durations, 50)), format_seconds(percentile(durations, 95)),
+            format_trend(trend(durations)), 'REGRESSION' if regression else '',
+        ))
+        if phases:
+            rows.extend(phase_rows(history, runs))
+        if imports:
+            import_regressions, rows_ = import_rows(history, runs)
+            regressions += import_regressions
+            rows.extend(rows_)
+
+    widths = [max(len(row[i]) for row in [header] + rows) for i in range(len(header))]
+    for row in [header] + rows:
+        out.write('  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() + '\n')
+
+    latest = max(run[1] for runs in groups.values() for run in runs)
+    out.write('\nlast run: %s\n' % time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(latest)))
+    return regressions
+
+
+def phase_rows(history, runs):
+    """
+    Return the report rows of the per-phase timings of the runs.
+    """
+    order, durations = [], {}
+    for run in runs:
+        totals = {}
+        for phase, duration in history.phases(run[0]):
+            if phase not in durations:
+                order.append(phase)
+                durations[phase] = []
+            totals[phase] = totals.get(phase, 0) + duration
+        for phase, duration in totals.items():
+            durations[phase].append(duration)
+
+    rows = []
+    for phase in order:
+        values = durations[phase]
+        rows.append((
+            '  ' + phase, '', '', str(len(values)), format_seconds(values[-1]),
+            format_seconds(percentile(values, 50)), format_seconds(percentile(values, 95)),
+            format_trend(trend(values)), '',
+        ))
+    return rows
+
+
+def import_rows(history, runs):
+    """
+    Return the number of regressed imports, and the report rows of the
+    cumulative times of the slowest imports of the last run.
+    """
+    times = {}
+    for run in runs:
+        for module, _, cumulative, _ in history.imports(run[0]):
+            times.setdefault(module, []).append(cumulative)
+
+    rows = []
+    regressions = 0
+    for module, _, _, _ in history.imports(runs[-1][0])[:IMPORT_ROWS]:
+        values = times[module]
+        regression = is_regression(values)
+        regressions += regression
+        rows.append((
+            '  import ' + module, '', '', str(len(values)), format_seconds(values[-1], 3),
+            format_seconds(percentile(values, 50), 3), format_seconds(percentile(values, 95), 3),
+            format_trend(trend(values)), 'REGRESSION' if regression else '',
+        ))
+    return regressions, rows
+
+
+def get_workdir(args):
+    """
+    Return the work dir, as given or as configured by the tox config.
+    """
+    if args.workdir:
+        return py.path.local(args.workdir)
+
+    from tox.session import load_config, setup_reporter
+    toxargs = ['-c', args.configfile] if args.configfile else []
+    setup_reporter(toxargs)
+    return load_config(toxargs).toxworkdir
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='tox-venv-stats', description='Show the recorded testenv timings.')
+    parser.add_argument('-c', dest='configfile', help='The tox config file (default: as found by tox).')
+    parser.add_argument('--workdir', help='The tox work dir (default: as configured).')
+    parser.add_argument('-e', dest='env', help='Only show the runs of this testenv.')
+    parser.add_argument('--last', type=int, help='Only consider the last N runs of each testenv.')
+    parser.add_argument('--phases', action='store_true', help='Show the timings of each phase.')
+    parser.add_argument(
+        '--imports', action='store_true', help='Show the slowest imports of the commands (see --venv-importtime).',
+    )
+    parser.add_argument(
+        '--fail-on-regression', action='store_true', help='Exit with status 1 if the last run of a testenv regressed.',
+    )
+    args = parser.parse_args(argv)
+
+    history = History(get_workdir(args).join('.tox-venv', DATABASE))
+    regressions = report(history, env=args.env, last=args.last, phases=args.phases, imports=args.imports)
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
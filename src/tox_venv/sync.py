@@ -0,0 +1,215 @@
+import glob
+import io
+import os
+import re
+
+from tox.venv import CreationConfig
+
+# Attributes of the creation config that require a full recreate when changed.
+RECREATE_ATTRS = (
+    'base_resolved_python_sha256',
+    'base_resolved_python_path',
+    'tox_version',
+    'sitepackages',
+    'usedevelop',
+    'alwayscopy',
+)
+
+REQUIREMENT_RE = re.compile(r'^\s*([A-Za-z0-9][A-Za-z0-9._-]*)\s*(\[[^\]]*\])?\s*(.*)$')
+
+
+def canonical_name(name):
+    """
+    Normalize a project name as described by PEP 503.
+    """
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def requirement_name(dep):
+    """
+    Return the canonical project name of a dependency string, or `None` if the
+    dependency is opaque (e.g., an option, a path, or a URL).
+    """
+    if dep.startswith('-') or '/' in dep or '\\' in dep or ':' in dep.split(';')[0]:
+        return None
+    match = REQUIREMENT_RE.match(dep)
+    if match is None:
+        return None
+    return canonical_name(match.group(1))
+
+
+def requirement_pin(dep):
+    """
+    Return the exact version pinned by a dependency string (`name==version`),
+    or `None` if the dependency is not pinned to a single version.
+    """
+    match = REQUIREMENT_RE.match(dep)
+    if match is None:
+        return None
+    spec = match.group(3).split(';')[0].strip()
+    if not spec.startswith('==') or ',' in spec or '*' in spec:
+        return None
+    return spec[2:].strip()
+
+
+def site_packages_dirs(envdir):
+    """
+    Return the site-packages directories of the environment, without invoking
+    its interpreter.
+    """
+    patterns = [
+        os.path.join(str(envdir), 'lib', 'python*', 'site-packages'),
+        os.path.join(str(envdir), 'lib', 'site-packages'),
+        os.path.join(str(envdir), 'Lib', 'site-packages'),
+        os.path.join(str(envdir), 'site-packages'),
+    ]
+    paths = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+def read_metadata(path):
+    """
+    Read the `Name` and `Version` headers of a `METADATA` or `PKG-INFO` file.
+    Only the header block is parsed, as the body may be arbitrarily large.
+    """
+    headers = {}
+    with io.open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if not line.strip():
+                break
+            key, sep, value = line.partition(':')
+            if sep and key in ('Name', 'Version'):
+                headers.setdefault(key, value.strip())
+            if len(headers) == 2:
+                break
+    return headers.get('Name'), headers.get('Version')
+
+
+def installed_distributions(envdir):
+    """
+    Return a mapping of canonical project names to `(name, version, path)` for
+    the distributions installed in the environment. This reads the `*.dist-info`
+    and `*.egg-info` metadata directly instead of querying pip.
+    """
+    distributions = {}
+    for site_packages in site_packages_dirs(envdir):
+        for entry in sorted(os.listdir(site_packages)):
+            path = os.path.join(site_packages, entry)
+            if entry.endswith('.dist-info'):
+                metadata = os.path.join(path, 'METADATA')
+            elif entry.endswith('.egg-info'):
+                metadata = os.path.join(path, 'PKG-INFO') if os.path.isdir(path) else path
+            else:
+                continue
+            if not os.path.isfile(metadata):
+                continue
+            name, version = read_metadata(metadata)
+            if name:
+                distributions.setdefault(canonical_name(name), (name, version, path))
+    return distributions
+
+
+class SyncPlan(object):
+    """
+    The delta between an environment's previous and requested dependencies.
+    """
+
+    def __init__(self, install, uninstall, satisfied):
+        self.install = install
+        self.uninstall = uninstall
+        self.satisfied = satisfied
+
+    def __repr__(self):
+        return '<SyncPlan install=%r uninstall=%r>' % (self.install, self.uninstall)
+
+    def __str__(self):
+        parts = []
+        if self.install:
+            parts.append('install %s' % ', '.join(self.install))
+        if self.uninstall:
+            parts.append('uninstall %s' % ', '.join(self.uninstall))
+        return ', '.join(parts)
+
+    def __bool__(self):
+        return bool(self.install or self.uninstall)
+
+    __nonzero__ = __bool__
+
+
+def plan_sync(previous, live, installed):
+    """
+    Compute the `SyncPlan` for going from the `previous` to the `live`
+    creation config, given the `installed` distributions. Returns `None` if the
+    environment cannot be synchronised and must be recreated instead.
+    """
+    for attr in RECREATE_ATTRS:
+        if getattr(previous, attr) != getattr(live, attr):
+            return None
+
+    previous_deps = [dep for _, dep in previous.deps]
+    live_deps = [dep for _, dep in live.deps]
+
+    # a local file dep that was rebuilt has the same name, but a new digest
+    digests = dict((dep, digest) for digest, dep in previous.deps)
+    if any(dep in digests and digests[dep] != digest for digest, dep in live.deps):
+        return None
+
+    removed = [dep for dep in previous_deps if dep not in live_deps]
+    added = [dep for dep in live_deps if dep not in previous_deps]
+
+    # opaque deps can't be mapped to the distributions they installed
+    if any(requirement_name(dep) is None for dep in removed):
+        return None
+
+    live_names = set(requirement_name(dep) for dep in live_deps)
+    uninstall = []
+    for dep in removed:
+        name = requirement_name(dep)
+        if name not in live_names and name in installed and installed[name][0] not in uninstall:
+            uninstall.append(installed[name][0])
+
+    install, satisfied = [], []
+    for dep in added:
+        name, pin = requirement_name(dep), requirement_pin(dep)
+        if name in installed and pin is not None and installed[name][1] == pin:
+            satisfied.append(dep)
+        else:
+            install.append(dep)
+
+    return SyncPlan(install, uninstall, satisfied)
+
+
+def get_sync_plan(venv):
+    """
+    Determine whether the testenv can be synchronised in place. Returns a
+    `SyncPlan` if so, otherwise `None`.
+    """
+    if venv.envconfig.recreate or not venv.envconfig.venv_sync:
+        return None
+
+    previous = CreationConfig.readconfig(venv.path_config)
+    if previous is None:
+        return None
+
+    return plan_sync(previous, venv._getliveconfig(), installed_distributions(venv.path))
+
+
+def sync_deps(venv, action, plan, extraopts=()):
+    """
+    Install and uninstall only the dependencies that changed.
+    """
+    if plan.uninstall:
+        action.setactivity('sync-uninstall', ', '.join(plan.uninstall))
+        args = [str(venv.envconfig.envpython), '-m', 'pip', 'uninstall', '-y'] + plan.uninstall
+        env = venv._get_os_environ()
+        venv.ensure_pip_os_environ_ok(env)
+        venv._pcall(args, cwd=venv.envconfig.config.toxinidir, action=action, env=env)
+
+    if plan.install:
+        deps = [dep for dep in venv.get_resolved_dependencies() if dep.name in plan.install]
+        action.setactivity('sync-install', ', '.join(map(str, deps)))
+        venv._install(deps, extraopts=list(extraopts), action=action)
@@ -0,0 +1,152 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+
+from .archive import find_rewrites, rewrite
+from .cache import cache_dir, cached
+from .collect import USED, mark_used
+from .events import emit
+
+# Records the path a template was created at, and the files and links that embed it.
+MANIFEST = '.tox-venv-template.json'
+
+
+def use_template(venv):
+    return venv.envconfig.venv_template
+
+
+def virtualenv_args(venv):
+    """
+    Build the arguments for creating a virtual environment with virtualenv, as
+    tox does. The path of the environment should be appended to the arguments.
+    """
+    args = [sys.executable, '-m', 'virtualenv']
+    if venv.envconfig.sitepackages:
+        args.append('--system-site-packages')
+    if venv.envconfig.alwayscopy:
+        args.append('--always-copy')
+    args.append('--download' if venv.envconfig.download else '--no-download')
+    args.extend(['--python', str(venv.getsupportedinterpreter())])
+    return args
+
+
+def virtualenv_version():
+    try:
+        import virtualenv
+    except ImportError:  # pragma: no cover
+        return None
+    return getattr(virtualenv, '__version__', None)
+
+
+def template_key(venv, args):
+    """
+    Compute the cache key of a template, from the virtualenv arguments, the
+    interpreter and the version of virtualenv.
+    """
+    parts = args[1:] + [
+        '.'.join(map(str, venv.envconfig.python_info.version_info)),
+        'virtualenv=%s' % virtualenv_version(),
+    ]
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8') + b'\n')
+    return digest.hexdigest()[:16]
+
+
+def absolute_links(root):
+    """
+    Return the links of the environment at `root` that point into it, relative to `root`.
+    """
+    links = []
+    for dirpath, dirs, files in os.walk(str(root)):
+        for name in dirs + files:
+            path = os.path.join(dirpath, name)
+            if os.path.islink(path) and os.readlink(path).startswith(str(root) + os.sep):
+                links.append(os.path.relpath(path, str(root)).replace(os.sep, '/'))
+    return sorted(links)
+
+
+def write_manifest(path):
+    manifest = {
+        'path': str(path),
+        # the activate scripts embed the name of the environment in the prompt
+        'rewrite': find_rewrites(path, [path.basename]),
+        'links': absolute_links(path),
+    }
+    with io.open(str(path.join(MANIFEST)), 'w', encoding='utf-8') as f:
+        f.write(json.dumps(manifest, indent=2, sort_keys=True))
+
+
+def read_manifest(path):
+    with io.open(str(path.join(MANIFEST)), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def clone(template, path):
+    """
+    Copy the template into the (empty) directory of the testenv, and relocate
+    the copy by rewriting the files and links that embed the template's path.
+    """
+    for name in os.listdir(str(template)):
+        if name in (MANIFEST, USED) or name.endswith('.lock'):
+            continue
+        source, target = str(template.join(name)), str(path.join(name))
+        if os.path.islink(source):
+            os.symlink(os.readlink(source), target)
+        elif os.path.isdir(source):
+            shutil.copytree(source, target, symlinks=True)
+        else:
+            shutil.copy2(source, target)
+
+    manifest = read_manifest(template)
+    old, new = manifest['path'], str(path)
+    replacements = {
+        old.encode('utf-8'): new.encode('utf-8'),
+        os.path.basename(old).encode('utf-8'): path.basename.encode('utf-8'),
+    }
+    for relpath in manifest['rewrite']:
+        rewrite(path.join(relpath), replacements)
+    for relpath in manifest['links']:
+        link = path.join(relpath)
+        target = new + os.readlink(str(link))[len(old):]
+        link.remove()
+        os.symlink(target, str(link))
+
+
+def ensure_template(venv, action):
+    """
+    Return the cached template for the testenv's virtualenv arguments, creating
+    the template with virtualenv if it does not exist yet.
+    """
+    from .hooks import create_venv
+
+    args = virtualenv_args(venv)
+    key = template_key(venv, args)
+
+    def create(path):
+        action.setactivity('template-create', path)
+        path.ensure(dir=1)
+        create_venv(venv, action, args + [path.basename], path.dirpath())
+        write_manifest(path)
+
+    root = cache_dir(venv.envconfig.config, 'template')
+    hit = root.join(key).check()
+    if hit:
+        action.setactivity('template-reuse', root.join(key))
+    emit(venv.envconfig.config, 'cache', env=venv.name, cache='template', key=key, hit=hit)
+    template = cached(root, key, create)
+    mark_used(template)
+    return template
+
+
+def create_from_template(venv, action):
+    """
+    Create the testenv by cloning the cached template for its virtualenv arguments.
+    """
+    template = ensure_template(venv, action)
+    action.setactivity('template-clone', venv.path)
+    venv.path.ensure(dir=1)
+    clone(template, venv.path)
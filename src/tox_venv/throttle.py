@@ -0,0 +1,144 @@
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import time
+
+from filelock import FileLock, Timeout
+from tox import reporter
+
+from .cache import cache_dir
+from .history import median_duration
+
+# The interval at which a waiting testenv retries to acquire a slot.
+POLL_INTERVAL = 0.1
+
+# A phase that is this much slower than its recorded median indicates contention.
+SLOWDOWN_DECREASE = 1.5
+
+# A phase that is not slower than its recorded median by this factor leaves room for more.
+SLOWDOWN_INCREASE = 1.1
+
+
+def load_limit(maximum):
+    """
+    Scale the limit down when the system is overloaded, as the load includes
+    processes outside of tox.
+    """
+    try:
+        load = os.getloadavg()[0]
+    except (AttributeError, OSError):  # pragma: no cover
+        return maximum
+    cpus = multiprocessing.cpu_count()
+    if load <= cpus:
+        return maximum
+    return max(1, int(maximum * cpus / load))
+
+
+class Throttle(object):
+    """
+    A cross-process semaphore that limits the number of concurrent IO-heavy
+    phases (environment creation and installs) of a tox work dir. Each slot is
+    a file lock, and the number of slots adapts to the observed slowdown of the
+    phases (additive increase, multiplicative decrease) and to the load average.
+    """
+
+    def __init__(self, path, maximum):
+        self.path = path
+        self.maximum = maximum
+
+    def read_limit(self):
+        state = self.path.join('state.json')
+        if not state.check(file=1):
+            return self.maximum
+        try:
+            with io.open(str(state), encoding='utf-8') as f:
+                return min(max(int(json.load(f)['limit']), 1), self.maximum)
+        except (ValueError, KeyError, TypeError):
+            return self.maximum
+
+    def limit(self):
+        return min(self.read_limit(), load_limit(self.maximum))
+
+    def acquire(self, name):
+        self.path.ensure(dir=1)
+        waiting = False
+        while True:
+            for slot in range(self.limit()):
+                lock = FileLock(str(self.path.join('slot-%d.lock' % slot)))
+                try:
+                    lock.acquire(timeout=0)
+                except Timeout:
+                    continue
+                return lock
+            if not waiting:
+                reporter.verbosity1('%s waiting for a throttle slot (limit %d)' % (name, self.limit()))
+                waiting = True
+            time.sleep(POLL_INTERVAL)
+
+    def adjust(self, slowdown):
+        """
+        Adjust the limit from the slowdown of a phase, relative to its recorded
+        median duration.
+        """
+        with FileLock(str(self.path.join('state.lock'))):
+            limit = self.read_limit()
+            if slowdown >= SLOWDOWN_DECREASE:
+                limit = max(1, limit // 2)
+            elif slowdown <= SLOWDOWN_INCREASE:
+                limit = min(self.maximum, limit + 1)
+            with io.open(str(self.path.join('state.json')), 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'limit': limit}))
+        return limit
+
+
+def get_throttle(venv):
+    """
+    Return the `Throttle` of the tox work dir, or `None` if throttling is disabled.
+    """
+    config = venv.envconfig.config
+    maximum = config.option.venv_throttle
+    if not maximum:
+        return None
+    return Throttle(cache_dir(config, 'throttle'), maximum)
+
+
+@contextlib.contextmanager
+def throttled(venv, phase):
+    """
+    Hold a throttle slot for the duration of a phase of the testenv.
+    """
+    throttle = get_throttle(venv)
+    if throttle is None:
+        yield
+        return
+
+    lock = throttle.acquire(venv.name)
+    started = time.time()
+    try:
+        yield
+    finally:
+        lock.release()
+
+    median = median_duration(venv, phase)
+    if median:
+        limit = throttle.adjust((time.time() - started) / median)
+        reporter.verbosity2('%s throttle limit: %d' % (venv.name, limit))
+
+
+def throttle_package_install(venv):
+    """
+    Hold a throttle slot while the package is installed into the testenv.
+    """
+    if get_throttle(venv) is None:
+        return
+
+    def wrap(name, install):
+        def install_pkg(*args, **kwargs):
+            with throttled(venv, 'install-package'):
+                return install(*args, **kwargs)
+        setattr(venv, name, install_pkg)
+
+    for name in ['installpkg', 'developpkg']:
+        wrap(name, getattr(venv, name))
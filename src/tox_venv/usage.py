@@ -0,0 +1,67 @@
+"""
+Account for the resources used by the subprocesses of a testenv's run, from
+the deltas of `getrusage(RUSAGE_CHILDREN)` between the phase transitions. This
+includes every subprocess that tox and the plugin wait for during a phase: the
+interpreter probes, the environment creation, the installs and the commands.
+"""
+import sys
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    # Windows
+    resource = None
+
+
+def snapshot():
+    """
+    Return the resource usage of the terminated subprocesses so far, or `None`
+    where it is not available.
+    """
+    if resource is None:  # pragma: no cover
+        return None
+    return resource.getrusage(resource.RUSAGE_CHILDREN)
+
+
+def maxrss(usage):
+    # kilobytes, except on macOS
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+
+def delta(before, after):
+    """
+    Compute the resource usage between two snapshots: the CPU user and system
+    time in seconds, and the blocks read and written. The peak RSS of the
+    largest subprocess (in bytes) is only known if it exceeds the peak of all
+    previous subprocesses, and is `None` otherwise.
+    """
+    if before is None or after is None:
+        return None
+    return {
+        'utime': round(after.ru_utime - before.ru_utime, 6),
+        'stime': round(after.ru_stime - before.ru_stime, 6),
+        'maxrss': maxrss(after) if after.ru_maxrss > before.ru_maxrss else None,
+        'inblock': after.ru_inblock - before.ru_inblock,
+        'oublock': after.ru_oublock - before.ru_oublock,
+    }
+
+
+def merge(usage, other):
+    """
+    Add the resource usage of a repeated phase.
+    """
+    merged = dict((key, usage[key] + other[key]) for key in ('utime', 'stime', 'inblock', 'oublock'))
+    peaks = [peak for peak in (usage['maxrss'], other['maxrss']) if peak is not None]
+    merged['maxrss'] = max(peaks) if peaks else None
+    return merged
+
+
+def record_usage(venv, total, phases):
+    """
+    Attach the resource usage of the testenv's run, in total and per phase, to
+    its entry in the result JSON.
+    """
+    env_log = getattr(venv, 'env_log', None)
+    if env_log is None or total is None:
+        return
+    env_log.dict['resources'] = {'total': total, 'phases': phases}
@@ -0,0 +1,147 @@
+"""
+Prepare the plugin's caches for the testenvs of a tox config out of band (e.g.,
+in an image build step or a nightly job), without running any test commands,
+so that the first tox run only hits warm caches.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+import tox
+from tox import reporter
+from tox.session import build_session, load_config, setup_reporter
+
+from .buildenv import build_env_key, ensure_build_env, envpython, get_build_requires
+from .cache import cache_dir, temp_path
+from .hooks import get_real_executable, use_builtin_venv
+from .runner import streamed
+from .template import ensure_template, use_template
+
+
+def probe(venv):
+    """
+    Probe the testenv's interpreter. Returns its real executable, or `None` if
+    the interpreter is missing.
+    """
+    info = venv.envconfig.python_info
+    if info.version_info is None:
+        return None
+    if not use_builtin_venv(venv):
+        return info.executable
+    return get_real_executable(venv)
+
+
+def has_pip(executable):
+    with open(os.devnull, 'wb') as devnull:
+        return subprocess.call([executable, '-m', 'pip', '--version'], stdout=devnull, stderr=devnull) == 0
+
+
+def warm_wheels(venv, action, executable):
+    """
+    Build wheels of the testenv's deps with the pip of `executable`, which
+    populates pip's HTTP and wheel caches. The wheels themselves are discarded.
+    """
+    config = venv.envconfig.config
+    deps = [dep.name for dep in venv.get_resolved_dependencies()]
+    wheeldir = temp_path(cache_dir(config, 'warm'), venv.name)
+    args = [executable, '-m', 'pip', 'wheel', '--wheel-dir', str(wheeldir)]
+    if venv.envconfig.pip_pre:
+        args.append('--pre')
+    try:
+        wheeldir.ensure(dir=1)
+        with streamed(action):
+            venv._pcall(args + deps, venv=False, action=action, cwd=config.toxinidir)
+    finally:
+        wheeldir.remove(rec=1, ignore_errors=True)
+
+
+def warm_env(venv, warmed):
+    """
+    Warm the caches that the testenv uses: its template, its build environment,
+    and the wheels of its deps. The caches that were already warmed for another
+    testenv are skipped. Returns `False` if the testenv's interpreter is missing.
+    """
+    envconfig = venv.envconfig
+    executable = probe(venv)
+    if executable is None:
+        reporter.error('%s: interpreter %s not found' % (venv.name, envconfig.basepython))
+        return False
+    reporter.line('%s: %s' % (venv.name, executable))
+
+    # the wheels are built with the pip of an environment of the interpreter, as the base interpreter may lack pip,
+    # or have a pip that differs from the one of the testenv
+    pip_python = None
+    with venv.new_action('warm', envconfig.envdir) as action:
+        if not use_builtin_venv(venv) and use_template(venv):
+            pip_python = envpython(ensure_template(venv, action))
+
+        if envconfig.venv_build_cache and use_builtin_venv(venv) and not envconfig.skip_install:
+            requires = get_build_requires(envconfig.config.setupdir)
+            key = build_env_key(requires, executable, envconfig.python_info.version_info)
+            if key not in warmed:
+                ensure_build_env(venv, action, key, executable, requires)
+                warmed.add(key)
+            pip_python = envpython(cache_dir(envconfig.config, 'build', key))
+
+        deps = tuple(dep.name for dep in venv.get_resolved_dependencies())
+        if not deps or (executable, deps) in warmed:
+            return True
+        if pip_python is None and not has_pip(executable):
+            reporter.warning(
+                '%s: not building the wheels of the deps, as %s has no pip (the wheels are built in the build '
+                'environment with venv_build_cache, or in the template with venv_template)' % (venv.name, executable),
+            )
+            return True
+        warm_wheels(venv, action, pip_python or executable)
+        warmed.add((executable, deps))
+    return True
+
+
+def warm(session):
+    """
+    Warm the caches of the session's testenvs. Returns the number of testenvs
+    that could not be warmed.
+    """
+    warmed = set()
+    failed = 0
+    for venv in session.venv_dict.values():
+        try:
+            if not warm_env(venv, warmed):
+                failed += 1
+        except tox.exception.InvocationError as exception:
+            reporter.error('%s: %s' % (venv.name, exception))
+            failed += 1
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='tox-venv-warm',
+        description='Build the templates, build environments and dep wheels of the testenvs of a tox config, '
+                    'without running any test commands.',
+    )
+    parser.add_argument('-c', dest='configfile', help='The tox config file (default: as found by tox).')
+    parser.add_argument('-e', dest='envs', action='append', help='Warm this testenv (default: the envlist).')
+    parser.add_argument('--workdir', help='The tox work dir (default: as configured).')
+    args = parser.parse_args(argv)
+
+    toxargs = []
+    if args.configfile:
+        toxargs += ['-c', args.configfile]
+    if args.envs:
+        toxargs += ['-e', ','.join(args.envs)]
+    if args.workdir:
+        toxargs += ['--workdir', args.workdir]
+
+    setup_reporter(toxargs)
+    config = load_config(toxargs)
+    config.logdir.ensure(dir=1)
+    session = build_session(config)
+    failed = warm(session)
+    reporter.line('warmed %d of %d testenvs' % (len(session.venv_dict) - failed, len(session.venv_dict)))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+Stop the subprocesses of the creation path that hang (e.g., `ensurepip` stuck on
+a lock or a filesystem), instead of leaving the run waiting until the CI job
+times out. A subprocess that runs for too long, or that stops producing output,
+is killed along with its children, after capturing diagnostics from `/proc`.
+"""
+import io
+import os
+import signal
+import threading
+import time
+
+from tox.exception import InvocationError
+
+# The interval at which the watchdog checks the process and its output.
+WATCH_INTERVAL = 0.5
+
+# The maximum number of open files that are listed per process.
+MAX_OPEN_FILES = 50
+
+
+class StalledError(InvocationError):
+    """
+    A command that was killed by the watchdog.
+    """
+
+
+def read_proc(pid, name):
+    try:
+        with io.open('/proc/%d/%s' % (pid, name), 'rb') as f:
+            return f.read().decode('utf-8', 'replace')
+    except (IOError, OSError) as exception:
+        return '<unavailable: %s>' % (exception.strerror or exception)
+
+
+def parent_pids():
+    """
+    Map the pids of the running processes to their parent's pid.
+    """
+    parents = {}
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        stat = read_proc(int(name), 'stat')
+        # the command name may contain spaces and parentheses
+        fields = stat.rsplit(')', 1)[-1].split()
+        if len(fields) > 1:
+            parents[int(name)] = int(fields[1])
+    return parents
+
+
+def process_tree(pid):
+    """
+    Return the pid and the pids of all the descendants of a process. Only the
+    pid itself is known where `/proc` is not available.
+    """
+    if not os.path.isdir('/proc'):
+        return [pid]
+
+    parents = parent_pids()
+    tree = [pid]
+    for parent in tree:
+        tree.extend(sorted(child for child, ppid in parents.items() if ppid == parent))
+    return tree
+
+
+def open_files(pid):
+    try:
+        fds = sorted(os.listdir('/proc/%d/fd' % pid), key=int)
+    except (IOError, OSError) as exception:
+        return ['<unavailable: %s>' % (exception.strerror or exception)]
+
+    files = []
+    for fd in fds[:MAX_OPEN_FILES]:
+        try:
+            files.append('%s -> %s' % (fd, os.readlink('/proc/%d/fd/%s' % (pid, fd))))
+        except (IOError, OSError):
+            continue
+    if len(fds) > MAX_OPEN_FILES:
+        files.append('... %d more' % (len(fds) - MAX_OPEN_FILES))
+    return files
+
+
+def diagnose(pids):
+    """
+    Describe what the processes are doing: their command, state, the kernel
+    function they wait in (`wchan`), their kernel stack (which is usually only
+    readable by root), and their open files.
+    """
+    if not os.path.isdir('/proc'):
+        return 'no diagnostics (/proc is not available)\n'
+
+    lines = []
+    for pid in pids:
+        stat = read_proc(pid, 'stat').rsplit(')', 1)[-1].split()
+        lines.extend([
+            'pid %d: %s' % (pid, read_proc(pid, 'cmdline').replace('\0', ' ').strip()),
+            '  state: %s' % (stat[0] if stat else '?'),
+            '  wchan: %s' % read_proc(pid, 'wchan'),
+            '  stack:',
+        ])
+        lines.extend('    %s' % line for line in read_proc(pid, 'stack').splitlines())
+        lines.append('  open files:')
+        lines.extend('    %s' % line for line in open_files(pid))
+    return '\n'.join(lines) + '\n'
+
+
+def kill_tree(process, pids):
+    """
+    Kill the process and its descendants.
+    """
+    if os.name == 'nt':  # pragma: no cover
+        process.kill()
+        return
+
+    # stop the processes first, so that they can't spawn new children while being killed
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGSTOP)
+        except OSError:
+            continue
+    for pid in set(pids) | set(process_tree(process.pid)):
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:
+            continue
+
+
+class Watchdog(object):
+    """
+    Watch a process and its log file. The process (and its descendants) is
+    killed once it has run for longer than `timeout` seconds, or has not
+    written any output for `idle_timeout` seconds.
+    """
+
+    def __init__(self, process, path, timeout=None, idle_timeout=None):
+        self.process = process
+        self.path = str(path)
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.reason = None
+        self.diagnostics = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+
+    def __enter__(self):
+        if self.timeout or self.idle_timeout:
+            self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def expired(self, started, last_output):
+        now = time.time()
+        if self.timeout and now - started > self.timeout:
+            return 'timed out after %gs' % self.timeout
+        if self.idle_timeout and now - last_output > self.idle_timeout:
+            return 'no output for %gs' % self.idle_timeout
+        return None
+
+    def run(self):
+        started = last_output = time.time()
+        size = os.path.getsize(self.path)
+        while not self.stopped.wait(WATCH_INTERVAL):
+            if self.process.poll() is not None:
+                return
+            current = os.path.getsize(self.path)
+            if current != size:
+                size, last_output = current, time.time()
+
+            reason = self.expired(started, last_output)
+            if reason is not None:
+                pids = process_tree(self.process.pid)
+                self.diagnostics = diagnose(pids)
+                self.reason = reason
+                kill_tree(self.process, pids)
+                return
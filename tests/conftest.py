@@ -1 +1,38 @@
+import pytest
 from tox._pytestplugin import *  # noqa
+
+
+@pytest.fixture
+def getvenv(mocksession, newconfig):
+    """
+    Return a factory of the `py123` testenv, configured with the given lines of
+    settings and command line arguments.
+    """
+    def getvenv(*settings, **kwargs):
+        config = newconfig(list(kwargs.get('args', ())), '\n'.join(('[testenv:py123]', ) + settings))
+        mocksession.new_config(config)
+        return mocksession.getvenv('py123')
+    return getvenv
+
+
+@pytest.fixture
+def make_dist():
+    """
+    Return a factory of the metadata of a distribution that is installed into
+    a site-packages dir, optionally with the `sources` listed in its `RECORD`
+    and the `requires` of its `Requires-Dist` headers.
+    """
+    def make_dist(site_packages, name, version, kind='dist-info', sources=(), requires=()):
+        if kind == 'dist-info':
+            info = site_packages.join('%s-%s.dist-info' % (name, version))
+            metadata = info.join('METADATA')
+        else:
+            info = site_packages.join('%s-%s.egg-info' % (name, version))
+            metadata = info.join('PKG-INFO')
+        headers = ['Metadata-Version: 2.1', 'Name: %s' % name, 'Version: %s' % version]
+        headers += ['Requires-Dist: %s' % requirement for requirement in requires]
+        metadata.ensure().write('\n'.join(headers) + '\n\nName: ignored\n')
+        if sources:
+            info.join('RECORD').write(''.join('%s,sha256=abc,1\n' % source for source in sources))
+        return info
+    return make_dist
@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from tox_venv import archive
+
+
+@pytest.fixture
+def workdir(tmpdir):
+    toxworkdir = tmpdir.join('old', '.tox')
+    shared = toxworkdir.join('.tox-venv', 'shared', 'abc').ensure(dir=1)
+    shared.join('include', 'python.h').ensure()
+
+    env = toxworkdir.join('py37').ensure(dir=1)
+    env.join('.tox-config1').write('config')
+    env.join('pyvenv.cfg').write('home = /usr/bin\ncommand = /usr/bin/python3 -m venv %s\n' % env)
+    env.join('bin', 'activate').write('VIRTUAL_ENV="%s"\n' % env, ensure=True)
+    env.join('bin', 'pip').write('#!%s/bin/python\n' % env)
+    env.join('bin', 'pip').chmod(0o755)
+    env.join('bin', 'plain').write('#!/bin/sh\n')
+    env.join('log', 'py37-0.log').write('log', ensure=True)
+    record = env.join('lib', 'site-packages', 'pkg-0.1.dist-info', 'direct_url.json')
+    record.write('{"url": "file://%s/dist/pkg-0.1.zip"}' % tmpdir.join('old'), ensure=True)
+    finder = env.join('lib', 'site-packages', '__editable___pkg_0_1_finder.py')
+    finder.write("MAPPING = {'pkg': '%s/src/pkg'}\n" % tmpdir.join('old'))
+    env.join('lib', 'site-packages', '__editable__.pkg-0.1.pth').write('import __editable___pkg_0_1_finder\n')
+    os.symlink(str(shared.join('include')), str(env.join('include')))
+    return toxworkdir
+
+
+def test_find_envs(workdir):
+    assert archive.find_envs(workdir) == ['py37']
+
+
+def test_export_import(workdir, tmpdir):
+    path = tmpdir.join('envs.tar.gz')
+    manifest = archive.export_envs(workdir, ['py37'], path)
+    assert manifest['envs'] == {'py37': {'shared': ['.tox-venv/shared/abc']}}
+    assert sorted(manifest['rewrite']) == [
+        'py37/bin/activate',
+        'py37/bin/pip',
+        'py37/lib/site-packages/__editable___pkg_0_1_finder.py',
+        'py37/lib/site-packages/pkg-0.1.dist-info/direct_url.json',
+        'py37/pyvenv.cfg',
+    ]
+
+    toxworkdir = tmpdir.join('new', '.tox').ensure(dir=1)
+    toxworkdir.join('py37', 'stale').ensure()
+    archive.import_envs(toxworkdir, path)
+
+    env = toxworkdir.join('py37')
+    assert env.join('pyvenv.cfg').read() == 'home = /usr/bin\ncommand = /usr/bin/python3 -m venv %s\n' % env
+    assert env.join('bin', 'pip').read() == '#!%s/bin/python\n' % env
+    assert env.join('bin', 'pip').stat().mode & 0o777 == 0o755
+    assert env.join('bin', 'activate').read() == 'VIRTUAL_ENV="%s"\n' % env
+    direct_url = env.join('lib', 'site-packages', 'pkg-0.1.dist-info', 'direct_url.json')
+    assert direct_url.read() == '{"url": "file://%s/dist/pkg-0.1.zip"}' % tmpdir.join('new')
+    finder = env.join('lib', 'site-packages', '__editable___pkg_0_1_finder.py')
+    assert finder.read() == "MAPPING = {'pkg': '%s/src/pkg'}\n" % tmpdir.join('new')
+
+    # the link to the shared environment is relocated
+    assert not os.path.isabs(os.readlink(str(env.join('include'))))
+    assert env.join('include', 'python.h').check()
+
+    # the logs are not exported, and the existing testenv is replaced
+    assert not env.join('log').check()
+    assert not env.join('stale').check()
+    assert toxworkdir.join('.tox-venv').listdir() == [toxworkdir.join('.tox-venv', 'shared')]
+
+
+def test_main(workdir, tmpdir):
+    path = str(tmpdir.join('envs.tar'))
+    assert archive.main(['export', '--workdir', str(workdir), path]) == 0
+    toxworkdir = tmpdir.join('new', '.tox')
+    assert archive.main(['import', '--workdir', str(toxworkdir), path]) == 0
+    assert toxworkdir.join('py37', '.tox-config1').read() == 'config'
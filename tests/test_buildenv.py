@@ -0,0 +1,44 @@
+from tox_venv.buildenv import DEFAULT_REQUIRES, build_env_key, build_package, get_build_requires
+from tox_venv.cache import cache_dir
+
+
+def test_get_build_requires(tmpdir):
+    assert get_build_requires(tmpdir) == DEFAULT_REQUIRES
+
+    tmpdir.join('pyproject.toml').write('[build-system]\nrequires = ["flit_core>=2,<3"]\n')
+    assert get_build_requires(tmpdir) == ['flit_core>=2,<3']
+
+
+def test_build_env_key():
+    key = build_env_key(['wheel', 'setuptools'], '/usr/bin/python3', (3, 7, 3))
+    assert key == build_env_key(['setuptools', 'wheel'], '/usr/bin/python3', (3, 7, 3))
+    assert key != build_env_key(['setuptools', 'wheel'], '/usr/bin/python3', (3, 7, 4))
+    assert key != build_env_key(['setuptools'], '/usr/bin/python3', (3, 7, 3))
+
+
+def test_build_package(mocksession, newconfig):
+    config = newconfig(
+        [],
+        """\
+        [testenv:py123]
+        venv_build_cache = True
+        """,
+    )
+    mocksession.new_config(config)
+    venv = mocksession.getvenv('py123')
+
+    # the mocked build does not produce a wheel, so fall back to tox's packaging
+    assert build_package(mocksession, venv) is None
+    create, install, build = mocksession._pcalls
+    assert create.args[1:3] == ['-m', 'venv']
+    assert install.args[-4:] == ['pip', 'install'] + DEFAULT_REQUIRES
+    assert build.args[2:5] == ['pip', 'wheel', '--no-deps']
+
+    # the build env is published to the cache, and reused
+    path, = cache_dir(config, 'build').listdir(lambda p: p.check(dir=1))
+    assert create.args[-1] != str(path)
+    assert not cache_dir(config, 'dist').listdir()
+    mocksession._clearmocks()
+    assert build_package(mocksession, venv) is None
+    build, = mocksession._pcalls
+    assert build.args[2:4] == ['pip', 'wheel']
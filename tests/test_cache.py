@@ -0,0 +1,38 @@
+import pytest
+
+from tox_venv.cache import cached
+
+
+def test_cached(tmpdir):
+    built = []
+
+    def build(path):
+        built.append(path)
+        path.ensure('file')
+
+    entry = cached(tmpdir, 'key', build)
+    assert entry == tmpdir.join('key')
+    assert entry.join('file').check()
+    assert cached(tmpdir, 'key', build) == entry
+
+    # the entry was built in a temporary path, and then published
+    path, = built
+    assert path != entry and not path.check()
+
+
+def test_cached_failure(tmpdir):
+    def build(path):
+        path.ensure('file')
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        cached(tmpdir, 'key', build)
+    assert tmpdir.listdir() == [tmpdir.join('key.lock')]
+
+
+def test_cached_stale(tmpdir):
+    # the leftovers of a crashed build are removed
+    stale = tmpdir.ensure('key.tmp-1-abc', 'file')
+    cached(tmpdir, 'key', lambda path: path.ensure(dir=1))
+    assert not stale.check()
+    assert tmpdir.join('key').check(dir=1)
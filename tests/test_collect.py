@@ -0,0 +1,126 @@
+import errno
+import os
+
+import pytest
+
+from tox_venv import collect, options
+from tox_venv.cache import cache_dir
+
+pytestmark = pytest.mark.skipif('sys.platform == "win32"')
+
+
+def make_entry(path, size, used):
+    path.ensure('.tox-config1')
+    path.join('data').write_binary(b'x' * size)
+    path.join(collect.USED).ensure()
+    for name in ['.tox-config1', collect.USED, '.']:
+        os.utime(str(path.join(name)), (used, used))
+    return path
+
+
+def test_parse_size():
+    assert options.parse_size('512') == 512
+    assert options.parse_size('1k') == 1024
+    assert options.parse_size('1.5G') == 1536 * 1024 ** 2
+    assert options.parse_size('10MB') == 10 * 1024 ** 2
+    with pytest.raises(ValueError):
+        options.parse_size('lots')
+
+
+def test_collect(tmpdir):
+    old = make_entry(tmpdir.join('old'), 100000, 1000)
+    new = make_entry(tmpdir.join('new'), 100000, 3000)
+    build = make_entry(tmpdir.join('.tox-venv', 'build', 'abc'), 100000, 2000)
+    tmpdir.ensure('log', dir=1)
+
+    size = collect.disk_usage(new)
+    reclaimed = collect.collect(tmpdir, 2 * size)
+    assert reclaimed == collect.disk_usage(build)
+    assert not old.check()
+    assert build.check() and new.check()
+    assert tmpdir.join('log').check()
+    assert not tmpdir.listdir('*.tmp-*')
+
+
+def test_collect_in_use(tmpdir):
+    old = make_entry(tmpdir.join('old'), 100000, 1000)
+    new = make_entry(tmpdir.join('new'), 100000, 2000)
+    collect.mark_used(old)
+    try:
+        collect.collect(tmpdir, 0)
+    finally:
+        collect.HELD.pop().close()
+    assert old.check()
+    assert not new.check()
+
+
+def test_collect_linked(tmpdir):
+    shared = make_entry(tmpdir.join('.tox-venv', 'shared', 'abc'), 100000, 1000)
+    shared.ensure('bin', dir=1)
+    os.utime(str(shared), (1000, 1000))
+    env = make_entry(tmpdir.join('env'), 0, 2000)
+    env.join('bin').mksymlinkto(shared.join('bin'))
+    os.utime(str(env), (2000, 2000))
+
+    # the shared entry is kept while a testenv links to it
+    collect.collect(tmpdir, collect.disk_usage(shared))
+    assert shared.check() and not env.check()
+
+    collect.collect(tmpdir, 0)
+    assert not shared.check()
+
+
+def test_collect_pycs(tmpdir, monkeypatch):
+    store = tmpdir.join('.tox-venv', 'pycache', '420d0d0a', 'ab')
+    linked, unlinked = store.ensure('linked.pyc'), store.ensure('unlinked.pyc')
+    unlinked.write_binary(b'x' * 100)
+    os.link(str(linked), str(tmpdir.ensure('env', '__pycache__', dir=1).join('mod.cpython-37.pyc')))
+
+    # recently unlinked pycs may have just been compiled
+    assert collect.collect(tmpdir, 0) == 0
+    monkeypatch.setattr(collect, 'PYC_GRACE', -60)
+    assert collect.collect(tmpdir, 0) == 100
+    assert linked.check() and not unlinked.check()
+
+
+def test_collect_recently_active(tmpdir):
+    old = make_entry(tmpdir.join('old'), 100000, 1000)
+    old.ensure('log', 'py123-1.log')
+    assert collect.collect(tmpdir, 0) == 0
+    assert old.check()
+
+
+def test_mark_testenv(getvenv, monkeypatch):
+    monkeypatch.setattr(collect, 'HELD', [])
+
+    # the testenvs are only registered as used by the runs that collect
+    venv = getvenv()
+    venv.path.ensure(dir=1)
+    collect.mark_testenv(venv)
+    assert not venv.path.join(collect.USED).check()
+
+    venv = getvenv(args=['--venv-gc', '1G'])
+    collect.mark_testenv(venv)
+    assert venv.path.join(collect.USED).check()
+    assert collect.lock_unused(venv.path) is None
+    for f in collect.HELD:
+        f.close()
+
+
+def test_mark_used_unlockable(tmpdir, monkeypatch):
+    monkeypatch.setattr(collect, 'HELD', [])
+
+    def flock(fd, operation):
+        raise IOError(errno.ENOLCK, 'No locks available')
+
+    monkeypatch.setattr(collect.fcntl, 'flock', flock)
+    collect.mark_used(tmpdir)
+    assert collect.HELD == []
+
+
+def test_report_last_collect(newconfig, capsys):
+    # the result of the last collection is reported by the next one
+    config = newconfig([], '[tox]\nenvlist = py123')
+    cache_dir(config, collect.RESULT).ensure().write('{"finished": 0, "reclaimed": 2048}')
+    collect.report_last_collect(config)
+    assert 'reclaimed 2.0KB' in capsys.readouterr().out
@@ -0,0 +1,111 @@
+import pytest
+from tox.config.parallel import ENV_VAR_KEY_PRIVATE as PARALLEL_ENV_VAR_KEY_PRIVATE
+from tox.session.commands.run.sequential import installpkg
+
+from tox_venv.dedupe import MARKER, create_deduped, finish_deduped, fingerprint
+from tox_venv.failfast import RUN_ID
+from tox_venv.history import get_timings
+
+pytestmark = pytest.mark.skipif('sys.platform == "win32"')
+
+
+def getvenvs(mocksession, newconfig, args=()):
+    config = newconfig(
+        ['--venv-dedupe'] + list(args),
+        """\
+        [testenv]
+        deps = six
+        [testenv:lint]
+        [testenv:docs]
+        [testenv:other]
+        deps = mock
+        [testenv:mirror]
+        setenv = PIP_INDEX_URL = https://mirror.example.com/simple
+        """,
+    )
+    mocksession.new_config(config)
+    return [mocksession.getvenv(name) for name in ['lint', 'docs', 'other']]
+
+
+def create(path):
+    path.ensure('bin', 'python')
+
+
+def test_fingerprint(mocksession, newconfig):
+    lint, docs, other = getvenvs(mocksession, newconfig)
+    assert fingerprint(lint) == fingerprint(docs)
+    assert fingerprint(lint) != fingerprint(other)
+
+    # the installer settings of setenv change what is installed
+    assert fingerprint(lint) != fingerprint(mocksession.getvenv('mirror'))
+
+
+def test_create_deduped(mocksession, newconfig):
+    lint, docs, _ = getvenvs(mocksession, newconfig)
+    created = []
+
+    def create(path):
+        created.append(path)
+        path.ensure('bin', 'python')
+
+    for venv in [lint, docs]:
+        venv.path.ensure(dir=1)
+        venv.status = 0
+        with mocksession.newaction(venv.name, 'getenv') as action:
+            reused = create_deduped(venv, action, create)
+        assert venv.path.join('bin').check(link=1)
+        assert venv.path.join('bin', 'python').check()
+        finish_deduped(venv)
+
+    shared, = created
+    assert shared.join(MARKER).check()
+    assert not lint.dedupe_reused
+    assert docs.dedupe_reused and reused
+
+
+def test_create_deduped_recreate(mocksession, newconfig, monkeypatch):
+    def run(venv):
+        venv.path.ensure(dir=1)
+        venv.status = 0
+        with mocksession.newaction(venv.name, 'getenv') as action:
+            reused = create_deduped(venv, action, create)
+        finish_deduped(venv)
+        return reused
+
+    lint, docs, _ = getvenvs(mocksession, newconfig)
+    assert not run(lint)
+    lint.path.join('bin', 'python').write('installed')
+
+    # the shared environment is only recreated once per run, including by the parallel children of the run
+    lint, docs, _ = getvenvs(mocksession, newconfig, ['-r'])
+    assert not run(lint)
+    assert not lint.path.join('bin', 'python').read()
+    lint.path.join('bin', 'python').write('installed')
+    assert run(docs)
+
+    monkeypatch.setenv(PARALLEL_ENV_VAR_KEY_PRIVATE, 'docs')
+    monkeypatch.setenv(RUN_ID, lint.envconfig.config.venv_run_id)
+    _, docs, _ = getvenvs(mocksession, newconfig, ['-r'])
+    assert run(docs)
+    assert docs.path.join('bin', 'python').read() == 'installed'
+
+    # a later run recreates it again
+    monkeypatch.setenv(RUN_ID, 'other')
+    _, docs, _ = getvenvs(mocksession, newconfig, ['-r'])
+    assert not run(docs)
+
+
+def test_install_pkg_deduped(mocksession, newconfig, tmpdir):
+    package = tmpdir.join('pkg-1.0.tar.gz').ensure()
+    for venv in getvenvs(mocksession, newconfig)[:2]:
+        timings = get_timings(venv)
+        venv.path.ensure(dir=1)
+        with mocksession.newaction(venv.name, 'getenv') as action:
+            create_deduped(venv, action, create)
+        mocksession._clearmocks()
+        installpkg(venv, package)
+
+    # the package install is skipped in the reused environment, but still timed
+    assert venv.dedupe_reused
+    assert not mocksession._pcalls
+    assert timings.current[0] == 'install-package'
@@ -0,0 +1,107 @@
+import json
+import os
+import socket
+
+import pytest
+from tox.config.parallel import ENV_VAR_KEY_PRIVATE as PARALLEL_ENV_VAR_KEY_PRIVATE
+
+from tox_venv.events import emit, finish_events, open_stream
+from tox_venv.history import get_timings, record_run
+
+pytestmark = pytest.mark.skipif('sys.platform == "win32"')
+
+
+def read_events(path):
+    with open(str(path)) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_open_stream_fd(tmpdir):
+    path = tmpdir.join('events.jsonl')
+    fd = os.open(str(path), os.O_WRONLY | os.O_CREAT)
+    stream = open_stream('fd:%d' % fd)
+    stream.write({'event': 'test'})
+    stream.close()
+
+    # the original descriptor is left open
+    os.write(fd, b'{}\n')
+    os.close(fd)
+    assert read_events(path) == [{'event': 'test'}, {}]
+
+
+def test_open_stream_fifo(tmpdir):
+    path = tmpdir.join('events.fifo')
+    os.mkfifo(str(path))
+    assert open_stream(str(path)) is None
+
+    fd = os.open(str(path), os.O_RDONLY | os.O_NONBLOCK)
+    stream = open_stream(str(path))
+    stream.write({'event': 'test'})
+    assert os.read(fd, 1024) == b'{"event": "test"}\n'
+
+    # the stream is closed once the reader is gone
+    os.close(fd)
+    stream.write({'event': 'test'})
+    assert stream.fd is None
+
+
+def test_open_stream_unix(tmpdir):
+    path = tmpdir.join('events.sock')
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(path))
+    server.listen(1)
+
+    stream = open_stream('unix:%s' % path)
+    connection, _ = server.accept()
+    stream.write({'event': 'test'})
+    stream.close()
+    assert connection.makefile('rb').read() == b'{"event": "test"}\n'
+    connection.close()
+    server.close()
+
+
+def test_events(mocksession, newconfig, tmpdir):
+    path = tmpdir.join('events.jsonl')
+    config = newconfig(
+        ['--venv-events', str(path)],
+        """\
+        [testenv:py123]
+        commands = python -c 'print(1)'
+        """,
+    )
+    mocksession.new_config(config)
+    venv = mocksession.getvenv('py123')
+    venv.status = 0
+    timings = get_timings(venv)
+    timings.start('install-deps')
+    with mocksession.newaction(venv.name, 'getenv') as action:
+        venv._pcall(['python', '-m', 'pip'], cwd=tmpdir, venv=False, action=action)
+    emit(config, 'cache', env=venv.name, cache='build', hit=True)
+    record_run(venv)
+    finish_events(config)
+
+    events = read_events(path)
+    assert [event['event'] for event in events] == [
+        'run-start', 'env-start', 'phase-start', 'process-start', 'process-end', 'cache', 'phase-end', 'env-end',
+        'run-end',
+    ]
+    run_start, _, phase_start, process_start, process_end, cache, phase_end, env_end, _ = events
+    assert run_start['envs'] == ['py123']
+    assert phase_start['phase'] == phase_end['phase'] == 'install-deps'
+    assert process_start['args'][1:] == ['-m', 'pip']
+    assert process_start['process'] == process_end['process']
+    assert process_end['returncode'] == 0
+    assert cache['hit'] is True
+    assert env_end['status'] == 'ok'
+    assert all(event['pid'] == os.getpid() for event in events)
+
+
+def test_events_parallel_child(newconfig, tmpdir, monkeypatch):
+    monkeypatch.setenv(PARALLEL_ENV_VAR_KEY_PRIVATE, 'py123')
+    path = tmpdir.join('events.jsonl')
+    config = newconfig(['--venv-events', str(path)], '[testenv:py123]')
+    emit(config, 'env-start', env='py123')
+    finish_events(config)
+
+    # only the parent emits the events of the run
+    assert [event['event'] for event in read_events(path)] == ['env-start']
@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+
+from tox_venv import failfast
+
+
+@pytest.fixture
+def getvenvs(mocksession, newconfig, monkeypatch):
+    monkeypatch.setenv(failfast.RUN_ID, 'abc123')
+
+    def getvenvs():
+        config = newconfig(
+            ['--venv-fail-fast'],
+            """\
+            [tox]
+            envlist = a,b
+            """,
+        )
+        mocksession.new_config(config)
+        return [mocksession.getvenv(name) for name in ['a', 'b']]
+    return getvenvs
+
+
+def test_report_failure(getvenvs):
+    a, b = getvenvs()
+    config = a.envconfig.config
+    a.status = 0
+    failfast.report_failure(a)
+    assert not failfast.is_cancelled(config)
+
+    a.status = 'commands failed'
+    failfast.report_failure(a)
+    assert failfast.is_cancelled(config)
+    assert failfast.get_sentinel(config).read() == 'a'
+
+    with pytest.raises(KeyboardInterrupt):
+        failfast.check_cancelled(b)
+    assert b.status == 'keyboardinterrupt'
+
+
+def test_cleanup_cancelled(getvenvs):
+    a, b = getvenvs()
+    a.status = 'commands failed'
+    failfast.report_failure(a)
+
+    # complete testenvs are kept
+    for venv in [a, b]:
+        venv.status = 'keyboardinterrupt'
+        venv.path.ensure('bin', 'python')
+    a.path_config.ensure()
+
+    for venv in [a, b]:
+        failfast.cleanup_cancelled(venv)
+    assert a.path.check()
+    assert not b.path.check()
+
+
+def test_watch(getvenvs, monkeypatch):
+    a, _ = getvenvs()
+    interrupted = []
+    monkeypatch.setattr(failfast, 'POLL_INTERVAL', 0.01)
+    monkeypatch.setattr(failfast, 'interrupt_main', lambda: interrupted.append(True))
+
+    watcher = threading.Thread(target=failfast.watch, args=(a.envconfig.config, threading.Event()))
+    watcher.start()
+    a.status = 'commands failed'
+    failfast.report_failure(a)
+    watcher.join(5)
+    assert interrupted == [True]
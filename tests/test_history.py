@@ -0,0 +1,77 @@
+from tox_venv import stats
+from tox_venv.history import DATABASE, History, config_hash, get_history, get_timings, record_run
+
+COMMANDS = """\
+commands =
+    python -c 'print(1)'
+    python -c 'print(2)'
+"""
+
+
+def test_record_run(getvenv):
+    venv = getvenv(COMMANDS)
+    venv.status = 0
+    timings = get_timings(venv)
+    timings.start('install-deps')
+    venv.finishvenv()
+    timings.start('commands')
+    venv.test()
+    venv.hook.tox_runtest_post(venv=venv)
+
+    history = get_history(venv.envconfig.config)
+    (run_id, _, env, _, config, status, duration), = history.runs()
+    assert (env, config, status) == ('py123', config_hash(venv.envconfig), 'ok')
+    phases = history.phases(run_id)
+    assert [phase for phase, _ in phases] == [
+        'install-deps', 'install-package', 'commands[0]', 'commands[1]', 'commands', 'commands-post',
+    ]
+    assert duration == sum(duration for phase, duration in phases if not phase.startswith('commands['))
+
+    # the run is recorded once
+    record_run(venv)
+    assert len(history.runs()) == 1
+
+
+def test_config_hash(getvenv):
+    venv = getvenv(COMMANDS)
+    other = getvenv(COMMANDS, 'deps = six')
+    assert config_hash(venv.envconfig) == config_hash(getvenv(COMMANDS).envconfig)
+    assert config_hash(venv.envconfig) != config_hash(other.envconfig)
+
+
+def test_percentile():
+    values = [5, 1, 4, 2, 3]
+    assert stats.percentile(values, 50) == 3
+    assert stats.percentile(values, 95) == 5
+    assert stats.percentile([], 50) is None
+
+
+def test_is_regression():
+    assert not stats.is_regression([10, 10, 20])
+    assert not stats.is_regression([10, 11, 9, 10, 12])
+    assert stats.is_regression([10, 11, 9, 10, 13])
+
+
+def test_report(getvenv, capsys):
+    venv = getvenv(COMMANDS)
+    history = get_history(venv.envconfig.config)
+    for duration in [10, 11, 9, 10, 20]:
+        history.add_run(0, 'py123', 'py', 'abcdef0123', 'ok', duration, [('create', duration)])
+    history.add_run(0, 'py123', 'py', 'abcdef0123', 'failed', 1, [('create', 1)])
+
+    workdir = str(venv.envconfig.config.toxworkdir)
+    assert stats.main(['--workdir', workdir, '--phases']) == 0
+    assert stats.main(['--workdir', workdir, '--fail-on-regression']) == 1
+
+    out = capsys.readouterr().out
+    assert 'py123  py           abcdef01  5     20.0s  10.0s  20.0s  -      REGRESSION' in out
+    assert '  create' in out
+
+
+def test_report_configured_workdir(tmpdir, capsys):
+    tmpdir.join('tox.ini').write('[tox]\ntoxworkdir = {toxinidir}/build/tox\n')
+    history = History(tmpdir.join('build', 'tox', '.tox-venv', DATABASE))
+    history.add_run(0, 'py123', 'py', 'abcdef0123', 'ok', 10, [])
+
+    assert stats.main(['-c', str(tmpdir.join('tox.ini'))]) == 0
+    assert 'py123  py           abcdef01  1' in capsys.readouterr().out
@@ -0,0 +1,40 @@
+import subprocess
+import sys
+
+import pytest
+
+# The plugin is imported on every tox invocation, including `tox --help` and `tox -l`.
+MODULES = ['tox_venv', 'tox_venv.hooks', 'tox_venv.options']
+
+# The cumulative import time budget of the plugin, in microseconds. This is generous, so
+# that the test is not flaky on slow machines, but catches eagerly imported machinery.
+BUDGET = 25000
+
+
+def import_times():
+    """
+    Import the plugin after tox, and return the cumulative import time of each
+    module that it imports, as reported by `-X importtime`.
+    """
+    code = 'import tox.config, tox.session; import tox_venv.hooks'
+    output = subprocess.check_output([sys.executable, '-X', 'importtime', '-c', code], stderr=subprocess.STDOUT)
+
+    # the modules are listed after their own imports, and only top-level imports are not indented
+    entries = []
+    for line in output.decode('utf-8').splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  ') and name.strip() != 'tox_venv.hooks':
+            # a top-level import of tox, which precedes the plugin's imports
+            entries = []
+            continue
+        entries.append((name.strip(), int(cumulative)))
+    return dict(entries)
+
+
+@pytest.mark.skipif('sys.version_info < (3, 7)')
+def test_import_footprint():
+    times = import_times()
+    assert sorted(times) == MODULES
+    assert times['tox_venv.hooks'] < BUDGET
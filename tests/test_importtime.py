@@ -0,0 +1,78 @@
+import subprocess
+import sys
+
+import pytest
+
+from tox_venv import stats
+from tox_venv.history import get_history, get_timings, record_run
+from tox_venv.importtime import ImportProfile, profile_imports
+
+OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 |   _io
+import time:       300 |        500 |     encodings.aliases
+import time:       200 |        700 |   encodings
+import time: self [us] | cumulative | imported package
+import time:       150 |        150 |   _io
+import time:       400 |        900 | json
+not an import time
+"""
+
+
+def test_import_profile():
+    profile = ImportProfile()
+    ignored = [line for line in OUTPUT.splitlines() if not profile.feed(line)]
+    assert ignored == ['not an import time']
+    assert profile.processes == 2
+    assert profile.per_process() == pytest.approx(0.00045)
+    assert profile.top(2) == [('json', 1, 0.0009, 0.0004), ('encodings', 1, 0.0007, 0.0002)]
+    assert profile.top(10)[-1] == ('_io', 2, 0.0001, 0.0001)
+
+
+@pytest.mark.skipif('sys.version_info < (3, 7)')
+def test_profile_imports(mocksession, newconfig, tmpdir):
+    config = newconfig(
+        ['--venv-importtime'],
+        """\
+        [testenv:py123]
+        commands = python -c 'import json'
+        """,
+    )
+    mocksession.new_config(config)
+    venv = mocksession.getvenv('py123')
+    profile_imports(venv)
+
+    with mocksession.newaction(venv.name, 'runtests') as action:
+        action.via_popen = subprocess.Popen
+        venv._pcall(
+            [sys.executable, '-c', 'import json, sys; sys.stderr.write("error\\n")'], cwd=tmpdir, venv=False,
+            action=action, is_test_command=True, redirect=True,
+        )
+
+    # the import times are filtered out of the output
+    log, = action.log_dir.listdir('py123-*.log')
+    assert log.read().splitlines()[3:] == ['error']
+    assert venv.import_profile.processes == 1
+    assert 'json' in [module for module, _, _, _ in venv.import_profile.top(100)]
+
+    venv.status = 0
+    get_timings(venv).start('commands')
+    record_run(venv)
+    history = get_history(config)
+    (run_id, _, _, _, _, _, _), = history.runs()
+    imports = history.imports(run_id)
+    assert 'json' in [module for module, _, _, _ in imports]
+    assert imports == sorted(imports, key=lambda row: (-row[2], row[0]))
+
+
+def test_report_imports(mocksession, newconfig, capsys):
+    mocksession.new_config(newconfig([], '[testenv:py123]'))
+    history = get_history(mocksession.config)
+    for cumulative in [0.010, 0.011, 0.009, 0.010, 0.020]:
+        history.add_run(0, 'py123', 'py', 'abcdef0123', 'ok', 10, [], [('json', 1, cumulative, 0.001)])
+
+    workdir = str(mocksession.config.toxworkdir)
+    assert stats.main(['--workdir', workdir, '--imports', '--fail-on-regression']) == 1
+    out = capsys.readouterr().out
+    assert '  import json' in out
+    assert '0.020s  0.010s  0.020s' in out
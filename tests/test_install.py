@@ -0,0 +1,83 @@
+from tox.session.commands.run.sequential import develop_pkg, installpkg
+
+from tox_venv.dedupe import PACKAGE_RECORD, create_deduped
+from tox_venv.history import get_timings
+from tox_venv.install import get_package_target
+
+SETTINGS = ('venv_single_install = True', 'deps = six')
+
+
+def test_get_package_target(getvenv, tmpdir):
+    venv = getvenv(*SETTINGS)
+    assert get_package_target(venv) is None
+
+    venv.package = tmpdir.join('pkg-1.0.tar.gz')
+    assert get_package_target(venv) == [str(venv.package)]
+
+    venv = getvenv('extras = testing', *SETTINGS)
+    venv.package = tmpdir.join('pkg-1.0.tar.gz')
+    assert get_package_target(venv) == ['%s[testing]' % venv.package]
+
+    venv = getvenv('usedevelop = True', *SETTINGS)
+    assert get_package_target(venv) == ['-e', str(venv.envconfig.config.setupdir)]
+
+    venv = getvenv('skip_install = True', *SETTINGS)
+    venv.package = tmpdir.join('pkg-1.0.tar.gz')
+    assert get_package_target(venv) is None
+
+
+def test_install_combined(mocksession, getvenv, tmpdir):
+    venv = getvenv(*SETTINGS)
+    venv.package = tmpdir.join('pkg-1.0.tar.gz').ensure()
+
+    with mocksession.newaction(venv.name, 'getenv') as action:
+        venv.hook.tox_testenv_install_deps(action=action, venv=venv)
+    pcall, = mocksession._pcalls
+    assert pcall.args[-2] == 'six'
+    assert pcall.args[-1].endswith('pkg-1.0.tar.gz')
+
+    mocksession._clearmocks()
+    assert installpkg(venv, venv.package)
+    assert not mocksession._pcalls
+    assert venv.path_config.check()
+
+
+def test_install_combined_develop(mocksession, getvenv):
+    venv = getvenv('usedevelop = True', *SETTINGS)
+
+    with mocksession.newaction(venv.name, 'getenv') as action:
+        venv.hook.tox_testenv_install_deps(action=action, venv=venv)
+    pcall, = mocksession._pcalls
+    assert pcall.args[-3:-1] == ['six', '-e']
+
+    mocksession._clearmocks()
+    assert develop_pkg(venv, venv.envconfig.config.setupdir)
+    assert not mocksession._pcalls
+
+
+def test_install_separate_without_package(mocksession, getvenv):
+    venv = getvenv(*SETTINGS)
+
+    with mocksession.newaction(venv.name, 'getenv') as action:
+        venv.hook.tox_testenv_install_deps(action=action, venv=venv)
+    pcall, = mocksession._pcalls
+    assert pcall.args[-1] == 'six'
+
+
+def test_install_combined_deduped(mocksession, getvenv, tmpdir):
+    venv = getvenv(*SETTINGS, args=['--venv-dedupe'])
+    venv.package = tmpdir.join('pkg-1.0.tar.gz').ensure()
+    timings = get_timings(venv)
+    venv.path.ensure(dir=1)
+
+    with mocksession.newaction(venv.name, 'getenv') as action:
+        create_deduped(venv, action, lambda path: path.ensure('bin', 'python'))
+        venv.hook.tox_testenv_install_deps(action=action, venv=venv)
+
+    mocksession._clearmocks()
+    assert installpkg(venv, venv.package)
+    assert not mocksession._pcalls
+
+    # the wrappers of the other features still apply to the package install
+    assert venv.dedupe_shared.join(PACKAGE_RECORD).check()
+    assert timings.current[0] == 'install-package'
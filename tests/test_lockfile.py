@@ -0,0 +1,103 @@
+from tox_venv.lockfile import get_lockfile, locked_pins
+
+LOCKFILE = 'venv_lockfile = {toxinidir}/locks/{envname}.txt'
+
+
+def deps(*names):
+    return 'deps =\n' + ''.join('    %s\n' % name for name in names)
+
+
+def test_lockfile_disabled(getvenv):
+    assert get_lockfile(getvenv()) is None
+
+
+def test_lockfile_unlockable(getvenv):
+    venv = getvenv(LOCKFILE, deps('-rrequirements.txt'))
+    assert get_lockfile(venv) is None
+
+
+def test_lockfile_roundtrip(getvenv):
+    venv = getvenv(LOCKFILE, deps('six'))
+    lockfile = get_lockfile(venv)
+    assert lockfile.path == venv.envconfig.config.toxinidir.join('locks', 'py123.txt')
+    assert lockfile.read() is None
+
+    lockfile.write(['six==1.12.0'])
+    assert lockfile.read() == ['six==1.12.0']
+
+    # changing the deps invalidates the lock file
+    venv = getvenv(LOCKFILE, deps('six', 'mock'))
+    assert get_lockfile(venv).read() is None
+
+
+def test_locked_pins(getvenv, make_dist):
+    venv = getvenv(LOCKFILE, deps('setuptools', 'mock[testing]'))
+    site_packages = venv.path.join('lib', 'python3.7', 'site-packages')
+    requires = ['six', 'pip', 'pytest; extra == "testing"', 'sphinx; extra == "docs"']
+    make_dist(site_packages, 'Mock', '3.0', requires=requires)
+    make_dist(site_packages, 'six', '1.12.0')
+    make_dist(site_packages, 'pip', '19.0')
+    make_dist(site_packages, 'setuptools', '41.0')
+    make_dist(site_packages, 'sphinx', '2.0')
+    make_dist(site_packages, 'attrs', '19.1.0')
+    make_dist(site_packages, 'funcsigs', '1.0')
+    pytest = make_dist(site_packages, 'pytest', '4.0', kind='egg-info')
+    pytest.join('requires.txt').write('attrs\n\n[:python_version < "3"]\nfuncsigs\n\n[docs]\nsphinx\n')
+
+    # orphaned distributions and the unrequested extras are not locked
+    assert locked_pins(venv) == [
+        'attrs==19.1.0', 'funcsigs==1.0', 'Mock==3.0', 'pytest==4.0', 'setuptools==41.0', 'six==1.12.0',
+    ]
+
+
+def test_locked_pins_project(getvenv, make_dist):
+    venv = getvenv(LOCKFILE, deps('pytest-myproj'))
+    site_packages = venv.path.join('lib', 'python3.7', 'site-packages')
+    make_dist(site_packages, 'pytest-myproj', '1.0', requires=['myproj', 'six'])
+    make_dist(site_packages, 'six', '1.12.0')
+    project = make_dist(site_packages, 'myproj', '0.1', requires=['six'])
+    direct_url = '{"url": "file:///src/myproj/.tox/dist/myproj-0.1.tar.gz", "archive_info": {}}'
+    project.join('direct_url.json').write(direct_url)
+
+    # the package under test is never locked, even if a dep requires it
+    assert locked_pins(venv) == ['pytest-myproj==1.0', 'six==1.12.0']
+
+
+def test_install_deps_locked(mocksession, getvenv):
+    venv = getvenv(LOCKFILE, deps('six'))
+    get_lockfile(venv).write(['six==1.12.0'])
+
+    with mocksession.newaction(venv.name, 'getenv') as action:
+        venv.hook.tox_testenv_install_deps(action=action, venv=venv)
+
+    pcall, = mocksession._pcalls
+    assert pcall.args[-2:] == ['--no-deps', 'six==1.12.0']
+
+
+def test_install_deps_generates_lockfile(mocksession, getvenv, make_dist):
+    venv = getvenv(LOCKFILE, deps('six'))
+    make_dist(venv.path.join('lib', 'python3.7', 'site-packages'), 'six', '1.12.0')
+
+    with mocksession.newaction(venv.name, 'getenv') as action:
+        venv.hook.tox_testenv_install_deps(action=action, venv=venv)
+
+    pcall, = mocksession._pcalls
+    assert pcall.args[-1] == 'six'
+    assert get_lockfile(venv).read() == ['six==1.12.0']
+
+
+def test_sync_deps_generates_lockfile(mocksession, getvenv, make_dist):
+    venv = getvenv(LOCKFILE, deps('six'), 'venv_sync = True')
+    previous = venv._getliveconfig()
+    previous.deps = [('sha', 'mock')]
+    previous.writeconfig(venv.path_config)
+    make_dist(venv.path.join('lib', 'python3.7', 'site-packages'), 'six', '1.12.0')
+
+    with mocksession.newaction(venv.name, 'getenv') as action:
+        venv.hook.tox_testenv_create(action=action, venv=venv)
+        venv.hook.tox_testenv_install_deps(action=action, venv=venv)
+
+    # the deps are synchronised, and the stale lock file is regenerated
+    pcall, = mocksession._pcalls
+    assert pcall.args[-1] == 'six'
+    assert get_lockfile(venv).read() == ['six==1.12.0']
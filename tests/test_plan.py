@@ -0,0 +1,96 @@
+import sys
+
+import pytest
+from tox.venv import CreationConfig
+
+from tox_venv.history import get_history
+from tox_venv.plan import get_plan, live_config, resolve_interpreter
+
+
+def getconfig(newconfig, args=(), deps=('six', ), settings=''):
+    return newconfig(
+        list(args),
+        """\
+        [testenv:py123]
+        basepython = %s
+        deps =
+            %s
+        %s
+        """ % (sys.executable, '\n            '.join(deps), settings),
+    )
+
+
+def write_previous(mocksession, config):
+    """
+    Write the creation config of a previous run of the testenv.
+    """
+    mocksession.new_config(config)
+    venv = mocksession.getvenv('py123')
+    venv.path.ensure(dir=1)
+    live_config(venv, sys.executable).writeconfig(venv.path_config)
+
+
+def plan(config):
+    (env_plan, ) = get_plan(config)
+    return env_plan.action, env_plan.reason, env_plan.estimate
+
+
+def test_plan_no_previous_config(newconfig):
+    config = getconfig(newconfig)
+    action, reason, estimate = plan(config)
+    assert action == 'recreate'
+    assert reason.startswith('no previous config')
+    assert estimate is None
+
+
+def test_plan_reuse(mocksession, newconfig):
+    config = getconfig(newconfig)
+    write_previous(mocksession, config)
+    history = get_history(config)
+    history.add_run(0, 'py123', 'py', 'abc', 'ok', 3, [('create', 1), ('commands', 2)])
+    history.add_run(1, 'py123', 'py', 'abc', 'ok', 5, [('create', 1), ('commands', 4)])
+    history.add_run(2, 'py123', 'py', 'abc', 'ok', 4, [('create', 1), ('commands', 3)])
+
+    # only the commands are run when the testenv is reused
+    assert plan(config) == ('reuse', None, 3)
+    assert plan(getconfig(newconfig, ['-r'])) == ('recreate', '-r flag', 4)
+
+
+def test_plan_changed_deps(mocksession, newconfig):
+    write_previous(mocksession, getconfig(newconfig, deps=('six', )))
+    metadata = mocksession.getvenv('py123').path.join('lib', 'python3.7', 'site-packages', 'six-1.12.0.dist-info')
+    metadata.join('METADATA').ensure().write('Metadata-Version: 2.1\nName: six\nVersion: 1.12.0\n')
+    config = getconfig(newconfig, deps=('six', 'attrs'))
+
+    action, reason, _ = plan(config)
+    assert action == 'recreate'
+    assert 'attrs' in reason
+
+    config = getconfig(newconfig, deps=('six', 'attrs'), settings='venv_sync = true')
+    assert plan(config)[:2] == ('repair', 'install attrs')
+
+    # deduped testenvs are not synchronised
+    config = getconfig(newconfig, ['--venv-dedupe'], deps=('six', 'attrs'), settings='venv_sync = true')
+    assert plan(config)[0] == 'recreate'
+
+
+def test_resolve_interpreter(newconfig, tmpdir):
+    config = newconfig([], '[testenv:legacy]\nbasepython = python2.7\n')
+    envconfig = config.envconfigs['legacy']
+    python = tmpdir.join('bin', 'python2.7').ensure()
+    previous = CreationConfig('sha', str(python), '3.28.0', False, False, [], False)
+
+    # the interpreter the testenv was created with is assumed without running it
+    assert resolve_interpreter(envconfig, previous) == (str(python), (2, 7))
+
+    envconfig.basepython = sys.executable
+    assert resolve_interpreter(envconfig, None)[0] == sys.executable
+
+
+def test_plan_option(newconfig, capsys):
+    with pytest.raises(SystemExit) as excinfo:
+        getconfig(newconfig, ['--venv-plan'])
+    assert excinfo.value.code == 0
+    out, _ = capsys.readouterr()
+    assert 'py123  recreate  unknown - no previous config' in out
+    assert 'estimated 0.0s in total (1 testenvs without recorded runs)' in out
@@ -0,0 +1,86 @@
+import os
+
+import pytest
+
+from tox_venv import bytecompile
+from tox_venv.pycache import installed_sources
+from tox_venv.sync import installed_distributions
+
+SHARED = 'venv_shared_pycache = True'
+
+
+def test_installed_sources(tmpdir, make_dist):
+    site_packages = tmpdir.join('lib', 'python3.8', 'site-packages')
+    make_dist(site_packages, 'six', '1.12.0', sources=['six.py', 'six-1.12.0.dist-info/RECORD'])
+    assert installed_sources(tmpdir, {}) == [str(site_packages.join('six.py'))]
+
+    before = installed_distributions(tmpdir)
+    make_dist(site_packages, 'mock', '3.0', sources=['mock/__init__.py', '../../../bin/mock.py'])
+    assert installed_sources(tmpdir, before) == [str(site_packages.join('mock', '__init__.py'))]
+
+
+def test_install_deps_compiles(mocksession, getvenv, make_dist, monkeypatch):
+    # the mocked install does not install anything, so pretend six was installed by it
+    monkeypatch.setattr('tox_venv.sync.installed_distributions', lambda path: {})
+    venv = getvenv(SHARED, 'deps = six')
+    site_packages = venv.path.join('lib', 'python3.8', 'site-packages')
+    make_dist(site_packages, 'six', '1.12.0', sources=['six.py'])
+
+    with mocksession.newaction(venv.name, 'getenv') as action:
+        venv.hook.tox_testenv_install_deps(action=action, venv=venv)
+
+    install, compile = mocksession._pcalls
+    assert install.args[-2:] == ['--no-compile', 'six']
+    assert compile.args[1].endswith('bytecompile.py')
+    assert compile.args[3:5] == ['1', 'checked-hash']
+    assert compile.args[5].endswith(os.path.join('.tox-venv', 'pycache'))
+
+
+def test_install_deps_compiles_parallel(mocksession, getvenv, make_dist, monkeypatch):
+    monkeypatch.setattr('tox_venv.sync.installed_distributions', lambda path: {})
+    venv = getvenv(SHARED, 'venv_compile = parallel', 'deps = six')
+    make_dist(venv.path.join('lib', 'python3.8', 'site-packages'), 'six', '1.12.0', sources=['six.py'])
+
+    with mocksession.newaction(venv.name, 'getenv') as action:
+        venv.hook.tox_testenv_install_deps(action=action, venv=venv)
+
+    _, compile = mocksession._pcalls
+    assert compile.args[3] == '0'
+
+
+@pytest.mark.skipif('sys.version_info < (3, 7)')
+@pytest.mark.parametrize('workers', ['0', '1'])
+def test_bytecompile(tmpdir, workers):
+    source = tmpdir.join('mod.py')
+    source.write('x = 1\n')
+    compile_list = tmpdir.join('list')
+    compile_list.write('%s\n' % source)
+
+    assert bytecompile.main([str(compile_list), workers, 'checked-hash']) == 0
+    pyc, = tmpdir.join('__pycache__').listdir()
+    assert pyc.read_binary()[4:8] == b'\x03\x00\x00\x00'
+
+    source.write('x = (\n')
+    assert bytecompile.main([str(compile_list), workers]) == 1
+
+
+@pytest.mark.skipif('sys.version_info < (3, 7)')
+@pytest.mark.parametrize('workers', ['0', '1'])
+def test_bytecompile_shared(tmpdir, workers):
+    import importlib.util
+
+    sources = [tmpdir.ensure(name, 'mod.py') for name in ['a', 'b']]
+    for source in sources:
+        source.write('x = 1\n')
+    compile_list = tmpdir.join('list')
+    compile_list.write(''.join('%s\n' % source for source in sources))
+
+    store = tmpdir.join('store')
+    assert bytecompile.main([str(compile_list), workers, 'checked-hash', str(store)]) == 0
+    pycs = [importlib.util.cache_from_source(str(source)) for source in sources]
+    assert os.path.samefile(*pycs)
+    assert os.stat(pycs[0]).st_nlink == 3
+
+    # the import system fixes the filename of the shared code
+    spec = importlib.util.spec_from_file_location('mod', str(sources[1]))
+    assert spec.loader.get_code('mod').co_filename == str(sources[1])
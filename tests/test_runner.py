@@ -0,0 +1,74 @@
+import subprocess
+import sys
+
+import pytest
+from tox.exception import InvocationError
+
+from tox_venv.runner import TAIL_LINES, popen_logged, streamed, tail
+
+PRINT = 'import sys\nfor i in range(1000): print("line %%d" %% i)\nsys.exit(%d)'
+
+
+def test_tail(tmpdir):
+    path = tmpdir.join('log')
+    path.write('')
+    assert tail(path) == ''
+
+    path.write('header\n' + ''.join('line %d\n' % i for i in range(100)))
+    assert tail(path, 2) == 'line 98\nline 99\n'
+    assert tail(path, 200, offset=len('header\n')) == ''.join('line %d\n' % i for i in range(100))
+
+    path.write('line 1\nline 2')
+    assert tail(path, 1) == 'line 2'
+
+
+def getaction(mocksession, newconfig):
+    mocksession.new_config(newconfig([], '[testenv:py123]'))
+    venv = mocksession.getvenv('py123')
+    action = mocksession.newaction(venv.name, 'getenv')
+    action.via_popen = subprocess.Popen
+    return action
+
+
+def test_popen_logged(mocksession, newconfig, tmpdir):
+    with getaction(mocksession, newconfig) as action:
+        output = popen_logged(action, [sys.executable, '-c', PRINT % 0], cwd=tmpdir)
+
+    assert output.splitlines() == ['line %d' % i for i in range(1000 - TAIL_LINES, 1000)]
+    log, = action.log_dir.listdir('py123-*.log')
+    lines = log.read().splitlines()
+    assert lines[2].startswith('cmd: %s -c ' % sys.executable)
+    assert lines[2].endswith("sys.exit(0)'")
+    assert lines[3:] == ['line %d' % i for i in range(1000)]
+
+
+def test_popen_logged_fails(mocksession, newconfig, tmpdir, capfd):
+    with getaction(mocksession, newconfig) as action:
+        with pytest.raises(InvocationError) as excinfo:
+            popen_logged(action, [sys.executable, '-c', PRINT % 3], cwd=tmpdir)
+
+    assert excinfo.value.exit_code == 3
+    assert excinfo.value.out.splitlines()[-1] == 'line 999'
+    out = capfd.readouterr().out
+    assert 'line 999' in out
+    assert 'line %d\n' % (999 - TAIL_LINES) not in out
+
+
+def test_streamed(mocksession, newconfig, tmpdir):
+    with getaction(mocksession, newconfig) as action:
+        with streamed(action):
+            action.popen([sys.executable, '-c', 'print("streamed")'], cwd=tmpdir)
+        assert 'popen' not in vars(action)
+    log, = action.log_dir.listdir('py123-*.log')
+    assert log.read().splitlines()[-1] == 'streamed'
+
+
+def test_streamed_unsupported():
+    class Action(object):
+        def popen(self, args):
+            return 'popen'
+
+    # the runner is not used with the versions of tox that lack its internals
+    action = Action()
+    with streamed(action):
+        assert action.popen([]) == 'popen'
@@ -0,0 +1,47 @@
+from tox_venv.history import config_hash, get_history
+from tox_venv.schedule import expected_duration, order_failed_first, order_lpt
+
+
+def test_expected_duration():
+    assert expected_duration([], 'abc') is None
+    assert expected_duration([('abc', 'failed', 1)], 'abc') is None
+    assert expected_duration([('abc', 'ok', 3), ('abc', 'ok', 1), ('abc', 'ok', 2)], 'abc') == 2
+
+    # runs with the current config are preferred
+    assert expected_duration([('abc', 'ok', 3), ('def', 'ok', 1)], 'def') == 1
+    assert expected_duration([('abc', 'ok', 3), ('abc', 'ok', 1)], 'def') == 1
+
+
+def test_order_lpt():
+    durations = {'a': 10, 'b': 60, 'c': None, 'd': 30}
+    assert order_lpt(['a', 'b', 'c', 'd', 'e'], durations) == ['c', 'e', 'b', 'd', 'a']
+
+
+def test_order_failed_first():
+    runs = {
+        'a': [('abc', 'ok', 10)],
+        'b': [('abc', 'failed', 60), ('abc', 'ok', 60)],
+        'c': [('abc', 'ok', 10)],
+        'd': [('abc', 'failed', 1), ('abc', 'ok', 30)],
+        'e': [],
+    }
+    configs = {'a': 'abc', 'b': 'abc', 'c': 'def', 'd': 'abc', 'e': 'abc'}
+    assert order_failed_first(['a', 'b', 'c', 'd', 'e'], runs, configs) == ['d', 'b', 'c', 'e', 'a']
+
+
+def test_configure_order(newconfig):
+    ini = """\
+        [tox]
+        envlist = a,b,c
+        """
+    config = newconfig([], ini)
+    history = get_history(config)
+    for name, duration in [('a', 10), ('b', 60), ('c', 30)]:
+        envconfig = config.envconfigs[name]
+        history.add_run(0, name, 'py', config_hash(envconfig), 'ok', duration, [])
+
+    assert newconfig([], ini).envlist == ['a', 'b', 'c']
+    assert newconfig(['--venv-order', 'lpt'], ini).envlist == ['b', 'c', 'a']
+
+    history.add_run(1, 'c', 'py', config_hash(config.envconfigs['c']), 'failed', 1, [])
+    assert newconfig(['--venv-order', 'failed-first'], ini).envlist == ['c', 'a', 'b']
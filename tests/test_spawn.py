@@ -0,0 +1,37 @@
+import subprocess
+import sys
+
+import pytest
+
+from tox_venv import spawn
+
+PRINT = [sys.executable, '-c', 'import sys; sys.stdout.write("out"); sys.stderr.write("err"); sys.exit(%d)']
+
+
+@pytest.fixture(params=[True, False], ids=['posix_spawn', 'subprocess'])
+def backend(request, monkeypatch):
+    if request.param and not spawn.use_posix_spawn():
+        pytest.skip('posix_spawn is not available')
+    monkeypatch.setattr(spawn, 'use_posix_spawn', lambda: request.param)
+
+
+def command(code):
+    return PRINT[:2] + [PRINT[2] % code]
+
+
+def test_check_output(backend, capfd):
+    assert spawn.check_output(command(0)) == b'out'
+    assert capfd.readouterr().err == 'err'
+    assert spawn.check_output(command(0), stderr=subprocess.STDOUT) == b'outerr'
+
+
+def test_check_output_error(backend):
+    with pytest.raises(subprocess.CalledProcessError) as excinfo:
+        spawn.check_output(command(3))
+    assert excinfo.value.returncode == 3
+    assert excinfo.value.output == b'out'
+
+
+def test_check_output_missing(backend):
+    with pytest.raises(OSError):
+        spawn.check_output(['tox-venv-does-not-exist'])
@@ -0,0 +1,101 @@
+from tox.venv import CreationConfig
+
+from tox_venv.sync import (
+    canonical_name,
+    installed_distributions,
+    plan_sync,
+    requirement_name,
+    requirement_pin,
+)
+
+
+def make_config(deps, sitepackages=False, digest='sha'):
+    return CreationConfig(
+        'sha', '/usr/bin/python3', '3.14.0', sitepackages, False,
+        [(digest, dep) for dep in deps], False,
+    )
+
+
+def test_canonical_name():
+    assert canonical_name('Foo_Bar.baz') == 'foo-bar-baz'
+
+
+def test_requirement_name():
+    assert requirement_name('Django>=2.0') == 'django'
+    assert requirement_name('requests[security] == 2.0') == 'requests'
+    assert requirement_name('pytest; python_version >= "3"') == 'pytest'
+    assert requirement_name('-rrequirements.txt') is None
+    assert requirement_name('./path/to/pkg') is None
+    assert requirement_name('git+https://example.com/pkg.git') is None
+
+
+def test_requirement_pin():
+    assert requirement_pin('six==1.12.0') == '1.12.0'
+    assert requirement_pin('six == 1.12.0 ; python_version < "3"') == '1.12.0'
+    assert requirement_pin('six>=1.12') is None
+    assert requirement_pin('six==1.*') is None
+    assert requirement_pin('six') is None
+
+
+def test_installed_distributions(tmpdir, make_dist):
+    site_packages = tmpdir.join('lib', 'python3.7', 'site-packages')
+    make_dist(site_packages, 'Six', '1.12.0')
+    make_dist(site_packages, 'legacy_pkg', '0.1', kind='egg-info')
+    site_packages.join('six.py').ensure()
+
+    installed = installed_distributions(tmpdir)
+    assert sorted(installed) == ['legacy-pkg', 'six']
+    assert installed['six'][:2] == ('Six', '1.12.0')
+    assert installed['legacy-pkg'][:2] == ('legacy_pkg', '0.1')
+
+
+def test_plan_sync():
+    installed = {
+        'six': ('six', '1.11.0', None),
+        'mock': ('mock', '3.0', None),
+        'attrs': ('attrs', '19.1.0', None),
+    }
+    previous = make_config(['six==1.11.0', 'mock', 'attrs'])
+    live = make_config(['six==1.12.0', 'attrs==19.1.0', 'pytest'])
+
+    plan = plan_sync(previous, live, installed)
+    assert plan.install == ['six==1.12.0', 'pytest']
+    assert plan.uninstall == ['mock']
+    assert plan.satisfied == ['attrs==19.1.0']
+    assert str(plan) == 'install six==1.12.0, pytest, uninstall mock'
+
+
+def test_plan_sync_unchanged():
+    config = make_config(['six'])
+    assert not plan_sync(config, make_config(['six']), {})
+
+
+def test_plan_sync_requires_recreate():
+    # flag changes require a full recreate
+    assert plan_sync(make_config(['six']), make_config(['six'], sitepackages=True), {}) is None
+
+    # removed opaque deps can't be uninstalled
+    assert plan_sync(make_config(['-rrequirements.txt']), make_config([]), {}) is None
+
+    # changed local file deps must be reinstalled
+    previous = make_config(['six', 'dist/pkg-1.0.tar.gz'])
+    assert plan_sync(previous, make_config(['six', 'dist/pkg-1.0.tar.gz'], digest='changed'), {}) is None
+
+
+def test_create_sync(mocksession, getvenv, make_dist):
+    venv = getvenv('venv_sync = True', 'deps = six')
+    previous = venv._getliveconfig()
+    previous.deps = [('sha', 'mock')]
+    previous.writeconfig(venv.path_config)
+    make_dist(venv.path.join('lib', 'python3.7', 'site-packages'), 'mock', '3.0')
+
+    with mocksession.newaction(venv.name, 'getenv') as action:
+        venv.hook.tox_testenv_create(action=action, venv=venv)
+        assert not mocksession._pcalls
+        assert venv.path.check()
+
+        venv.hook.tox_testenv_install_deps(action=action, venv=venv)
+
+    uninstall, install = mocksession._pcalls
+    assert uninstall.args[-4:] == ['pip', 'uninstall', '-y', 'mock']
+    assert install.args[-1] == 'six'
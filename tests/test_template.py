@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from tox_venv.template import create_from_template, template_key, virtualenv_args
+
+pytestmark = pytest.mark.skipif('sys.platform == "win32"')
+
+
+def getvenvs(mocksession, newconfig):
+    config = newconfig(
+        [],
+        """\
+        [testenv]
+        venv_template = True
+        [testenv:legacy]
+        [testenv:other]
+        [testenv:site]
+        sitepackages = True
+        """,
+    )
+    mocksession.new_config(config)
+    return [mocksession.getvenv(name) for name in ['legacy', 'other', 'site']]
+
+
+def test_template_key(mocksession, newconfig):
+    legacy, other, site = getvenvs(mocksession, newconfig)
+    assert virtualenv_args(legacy)[1:3] == ['-m', 'virtualenv']
+    assert '--system-site-packages' in virtualenv_args(site)
+    assert template_key(legacy, virtualenv_args(legacy)) == template_key(other, virtualenv_args(other))
+    assert template_key(legacy, virtualenv_args(legacy)) != template_key(site, virtualenv_args(site))
+
+
+def test_create_from_template(mocksession, newconfig, monkeypatch):
+    legacy, other, _ = getvenvs(mocksession, newconfig)
+    created = []
+
+    def virtualenv(args, cwd, **kwargs):
+        path = cwd.join(args[-1])
+        created.append(path)
+        path.join('pyvenv.cfg').write('home = /usr/bin\n', ensure=True)
+        path.join('bin', 'activate').write('VIRTUAL_ENV="%s"\nPROMPT="(%s)"\n' % (path, path.basename), ensure=True)
+        path.join('bin', 'pip').write('#!%s/bin/python\n' % path)
+        path.join('bin', 'pip').chmod(0o755)
+        os.symlink(str(path.join('lib')), str(path.join('lib64')))
+
+    for venv in [legacy, other]:
+        monkeypatch.setattr(venv, '_pcall', virtualenv)
+        with mocksession.newaction(venv.name, 'getenv') as action:
+            create_from_template(venv, action)
+
+        assert venv.path.join('bin', 'activate').read() == 'VIRTUAL_ENV="%s"\nPROMPT="(%s)"\n' % (venv.path, venv.name)
+        assert venv.path.join('bin', 'pip').read() == '#!%s/bin/python\n' % venv.path
+        assert venv.path.join('bin', 'pip').stat().mode & 0o777 == 0o755
+        assert os.readlink(str(venv.path.join('lib64'))) == str(venv.path.join('lib'))
+        assert sorted(os.listdir(str(venv.path))) == ['bin', 'lib64', 'pyvenv.cfg']
+
+    # the template is only created once, and is published to the cache
+    template, = created
+    assert not template.check()
@@ -0,0 +1,65 @@
+import pytest
+from filelock import FileLock, Timeout
+
+from tox_venv import options, throttle
+from tox_venv.history import get_history
+
+
+def test_parse_throttle():
+    assert options.parse_throttle('3') == 3
+    assert options.parse_throttle('auto') >= 1
+    with pytest.raises(ValueError):
+        options.parse_throttle('0')
+
+
+def test_acquire(tmpdir, monkeypatch):
+    monkeypatch.setattr(throttle, 'load_limit', lambda maximum: maximum)
+    slots = throttle.Throttle(tmpdir, 2)
+    first = slots.acquire('a')
+    second = slots.acquire('b')
+    assert first.lock_file != second.lock_file
+
+    # the third acquire waits for a slot to be released
+    def sleep(interval):
+        first.release()
+    monkeypatch.setattr(throttle.time, 'sleep', sleep)
+    third = slots.acquire('c')
+    assert third.lock_file == first.lock_file
+
+
+def test_adjust(tmpdir):
+    slots = throttle.Throttle(tmpdir, 4)
+    assert slots.read_limit() == 4
+    assert slots.adjust(2.0) == 2
+    assert slots.adjust(1.2) == 2
+    assert slots.adjust(1.0) == 3
+    assert throttle.Throttle(tmpdir, 4).read_limit() == 3
+
+
+def test_install_deps_throttled(mocksession, newconfig, monkeypatch):
+    config = newconfig(
+        ['--venv-throttle', '1'],
+        """\
+        [testenv:py123]
+        deps = six
+        """,
+    )
+    mocksession.new_config(config)
+    venv = mocksession.getvenv('py123')
+    history = get_history(config)
+    history.add_run(0, 'py123', 'py', 'abc', 'ok', 1, [('install-deps', 1000)])
+
+    # the slot is held during the install
+    slot = config.toxworkdir.join('.tox-venv', 'throttle', 'slot-0.lock')
+    held = []
+
+    def install(*args, **kwargs):
+        with pytest.raises(Timeout):
+            FileLock(str(slot)).acquire(timeout=0)
+        held.append(True)
+    monkeypatch.setattr(venv, '_install', install)
+
+    with mocksession.newaction(venv.name, 'getenv') as action:
+        assert venv.hook.tox_testenv_install_deps(action=action, venv=venv)
+    assert held == [True]
+    assert slot.dirpath().join('state.json').check()
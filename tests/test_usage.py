@@ -0,0 +1,49 @@
+import subprocess
+import sys
+from collections import namedtuple
+
+import pytest
+
+from tox_venv.history import get_timings, record_run
+from tox_venv.usage import delta, merge
+
+pytestmark = pytest.mark.skipif('sys.platform == "win32"')
+
+Usage = namedtuple('Usage', 'ru_utime ru_stime ru_maxrss ru_inblock ru_oublock')
+
+
+def test_delta():
+    before = Usage(1.0, 0.5, 1000, 10, 20)
+    usage = delta(before, Usage(3.5, 1.0, 2000, 15, 20))
+    assert usage['utime'] == 2.5
+    assert usage['stime'] == 0.5
+    assert usage['inblock'] == 5
+    assert usage['oublock'] == 0
+    assert usage['maxrss'] in (2000, 2000 * 1024)
+
+    # the peak of smaller subprocesses is unknown
+    assert delta(before, before)['maxrss'] is None
+    assert delta(None, before) is None
+
+
+def test_merge():
+    usage = {'utime': 1.0, 'stime': 0.5, 'maxrss': None, 'inblock': 1, 'oublock': 2}
+    other = {'utime': 2.0, 'stime': 0.5, 'maxrss': 1024, 'inblock': 0, 'oublock': 1}
+    assert merge(usage, other) == {'utime': 3.0, 'stime': 1.0, 'maxrss': 1024, 'inblock': 1, 'oublock': 3}
+
+
+def test_record_usage(mocksession, newconfig):
+    config = newconfig([], '[testenv:py123]\n')
+    mocksession.new_config(config)
+    venv = mocksession.getvenv('py123')
+    venv.status = 0
+    timings = get_timings(venv)
+    timings.start('install-deps')
+    subprocess.check_call([sys.executable, '-c', 'sum(range(10 ** 6))'])
+    timings.start('commands')
+    record_run(venv)
+
+    resources = venv.env_log.dict['resources']
+    assert sorted(resources['phases']) == ['commands', 'install-deps']
+    assert resources['phases']['install-deps']['utime'] > 0
+    assert resources['total']['utime'] >= resources['phases']['install-deps']['utime']
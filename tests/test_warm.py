@@ -0,0 +1,55 @@
+import sys
+
+from tox_venv.buildenv import DEFAULT_REQUIRES
+from tox_venv.cache import cache_dir
+from tox_venv.warm import warm
+
+
+def test_warm(newmocksession):
+    mocksession = newmocksession(
+        [],
+        """\
+        [tox]
+        envlist = py123,py456,missing
+        [testenv]
+        venv_build_cache = True
+        deps = six
+        commands = python -c 'print(1)'
+        [testenv:py456]
+        [testenv:missing]
+        basepython = python0.1
+        """,
+    )
+    config = mocksession.config
+    for name in ['py123', 'py456']:
+        config.envconfigs[name].basepython = sys.executable
+
+    assert warm(mocksession) == 1
+    create, install, wheel = mocksession._pcalls
+    assert create.args[1:3] == ['-m', 'venv']
+    assert install.args[-4:] == ['pip', 'install'] + DEFAULT_REQUIRES
+    assert wheel.args[1:4] == ['-m', 'pip', 'wheel']
+    assert str(wheel.args[0]).startswith(str(cache_dir(config, 'build')))
+    assert wheel.args[-1] == 'six'
+
+    # the identical testenvs share the caches, and the wheels are discarded
+    assert cache_dir(config, 'build').listdir(lambda p: p.check(dir=1))
+    assert not cache_dir(config, 'warm').listdir()
+    assert not any('print' in ' '.join(map(str, pcall.args)) for pcall in mocksession._pcalls)
+
+
+def test_warm_without_pip(newmocksession, monkeypatch, capsys):
+    mocksession = newmocksession(
+        [],
+        """\
+        [testenv:py123]
+        deps = six
+        """,
+    )
+    mocksession.config.envconfigs['py123'].basepython = sys.executable
+    monkeypatch.setattr('tox_venv.warm.has_pip', lambda executable: False)
+
+    # the wheels are skipped, as there is no build environment to build them with
+    assert warm(mocksession) == 0
+    assert not mocksession._pcalls
+    assert 'has no pip' in capsys.readouterr().out
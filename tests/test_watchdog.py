@@ -0,0 +1,94 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from tox_venv import options, watchdog
+from tox_venv.hooks import create_venv
+from tox_venv.runner import popen_logged
+from tox_venv.watchdog import StalledError, kill_tree, process_tree
+
+pytestmark = pytest.mark.skipif('not sys.platform.startswith("linux")')
+
+# Starts a child process that hangs, then prints a line.
+HANG = (
+    'import subprocess, sys\n'
+    'child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])\n'
+    'print("started", flush=True)\n'
+    'child.wait()\n'
+)
+
+
+def test_parse_timeout():
+    assert options.parse_timeout('') is None
+    assert options.parse_timeout('0') is None
+    assert options.parse_timeout('1.5') == 1.5
+    with pytest.raises(ValueError):
+        options.parse_timeout('-1')
+
+
+def test_kill_tree():
+    process = subprocess.Popen([sys.executable, '-c', HANG], stdout=subprocess.PIPE)
+    assert process.stdout.readline() == b'started\n'
+    pids = process_tree(process.pid)
+    assert len(pids) == 2
+
+    kill_tree(process, pids)
+    assert process.wait() == -9
+
+    # the orphaned child is killed too, and is reaped by init
+    child = '/proc/%d/cmdline' % pids[1]
+    time.sleep(0.1)
+    assert not os.path.exists(child) or not open(child).read()
+
+
+def test_popen_logged_stalled(mocksession, newconfig, tmpdir, monkeypatch):
+    monkeypatch.setattr(watchdog, 'WATCH_INTERVAL', 0.05)
+    mocksession.new_config(newconfig([], '[testenv:py123]'))
+    venv = mocksession.getvenv('py123')
+
+    started = time.time()
+    with mocksession.newaction(venv.name, 'getenv') as action:
+        action.via_popen = subprocess.Popen
+        with pytest.raises(StalledError):
+            popen_logged(action, [sys.executable, '-c', HANG], cwd=tmpdir, watchdog={'idle_timeout': 0.5})
+    assert time.time() - started < 10
+
+    log, = action.log_dir.listdir('py123-*.log')
+    lines = log.read().splitlines()
+    assert lines[3:5] == ['started', '']
+    assert lines[5] == 'killed by the watchdog (no output for 0.5s):'
+    assert sum(line.startswith('pid ') for line in lines) == 2
+    assert '  wchan: ' in ''.join(lines)
+
+
+def test_create_venv_retried(mocksession, newconfig, tmpdir, monkeypatch):
+    mocksession.new_config(newconfig([], '[testenv:py123]\nvenv_create_idle_timeout = 30\n'))
+    venv = mocksession.getvenv('py123')
+    calls = []
+
+    def pcall(args, cwd, **kwargs):
+        calls.append(kwargs['action'].popen.keywords['watchdog'])
+        cwd.join(args[-1], 'partial').ensure()
+        if len(calls) == 1:
+            raise StalledError(' '.join(args), -9, '')
+    monkeypatch.setattr(venv, '_pcall', pcall)
+
+    with mocksession.newaction(venv.name, 'getenv') as action:
+        create_venv(venv, action, ['python', '-m', 'venv', 'env'], tmpdir)
+    assert calls == [{'timeout': None, 'idle_timeout': 30}] * 2
+
+    # the creation is only retried once
+    del calls[:]
+
+    def stalled(args, **kwargs):
+        calls.append(args)
+        raise StalledError(' '.join(args), -9, '')
+    monkeypatch.setattr(venv, '_pcall', stalled)
+    with mocksession.newaction(venv.name, 'getenv') as action:
+        with pytest.raises(StalledError):
+            create_venv(venv, action, ['python', '-m', 'venv', 'env'], tmpdir)
+    assert len(calls) == 2
+    assert not tmpdir.join('env').listdir()